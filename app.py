@@ -4,9 +4,22 @@ from dash import dcc, html
 import dash_extensions as de
 import dash_bootstrap_components as dbc
 from dash.dependencies import Input, Output, State
+from utils.background import background_callback_manager
+from utils import prefetch
+from utils import prerender
+from utils.api import api
+from utils import assets
+from utils import encoding
+from utils import telemetry
 
-# default bootstrap theme
-app = dash.Dash(__name__, use_pages=True, external_stylesheets=[dbc.themes.BOOTSTRAP])
+# fingerprinted, resized and precompressed copies of the assets the pages use
+assets.build()
+
+# default bootstrap theme, heavy callbacks run on a local disk-backed background queue
+app = dash.Dash(__name__, use_pages=True, external_stylesheets=[dbc.themes.BOOTSTRAP] + assets.stylesheets(),
+    external_scripts=telemetry.scripts(), assets_ignore=assets.ignored_assets(),
+    background_callback_manager=background_callback_manager)
+server = app.server
 
 # the style arguments for the sidebar. We use position:fixed and a fixed width
 SIDEBAR_STYLE = {
@@ -34,7 +47,7 @@ sidebar = html.Div(
         html.Br(),
         html.A(
             html.Img(
-                src=app.get_asset_url('austin-animal-center-logo-wide.jpeg'), height="110px"
+                src=assets.asset_url('austin-animal-center-logo-wide.jpeg'), height="110px"
             ),
             title="Austin Animal Shelter",
             href="https://www.austintexas.gov/austin-animal-center/",
@@ -59,11 +72,11 @@ sidebar = html.Div(
 
 sm_bar = dbc.Row(
     [
-        dbc.Col(html.A(html.Img(src=app.get_asset_url('facebook-icon.png'), height="27px", className="mr-3", style={'margin-top':10, 'margin-bottom':10}), href="https://www.facebook.com/austintexasgov/", target="_blank")),
-        dbc.Col(html.A(html.Img(src=app.get_asset_url('insta-icon.png'), height="27px", className="mr-3", style={'margin-top':11, 'margin-bottom':9}), href="https://www.instagram.com/austintexasgov/", target="_blank")),
-        dbc.Col(html.A(html.Img(src=app.get_asset_url('twitter-icon.png'), height="25px", className="mr-3", style={'margin-top':11, 'margin-bottom':9}), href="https://twitter.com/austintexasgov/", target="_blank")),
-        dbc.Col(html.A(html.Img(src=app.get_asset_url('linkedin-icon.png'), height="23px", className="mr-3", style={'margin-top':10, 'margin-bottom':10}), href="https://www.linkedin.com/company/city-of-austin/", target="_blank")),
-        dbc.Col(html.A(html.Img(src=app.get_asset_url('youtube-icon.png'), height="25px", className="mr-3", style={'margin-top':11, 'margin-bottom':9}), href="https://www.youtube.com/user/austintexasgov/", target="_blank")),
+        dbc.Col(html.A(html.Img(src=assets.asset_url('facebook-icon.png'), height="27px", className="mr-3", style={'margin-top':10, 'margin-bottom':10}), href="https://www.facebook.com/austintexasgov/", target="_blank")),
+        dbc.Col(html.A(html.Img(src=assets.asset_url('insta-icon.png'), height="27px", className="mr-3", style={'margin-top':11, 'margin-bottom':9}), href="https://www.instagram.com/austintexasgov/", target="_blank")),
+        dbc.Col(html.A(html.Img(src=assets.asset_url('twitter-icon.png'), height="25px", className="mr-3", style={'margin-top':11, 'margin-bottom':9}), href="https://twitter.com/austintexasgov/", target="_blank")),
+        dbc.Col(html.A(html.Img(src=assets.asset_url('linkedin-icon.png'), height="23px", className="mr-3", style={'margin-top':10, 'margin-bottom':10}), href="https://www.linkedin.com/company/city-of-austin/", target="_blank")),
+        dbc.Col(html.A(html.Img(src=assets.asset_url('youtube-icon.png'), height="25px", className="mr-3", style={'margin-top':11, 'margin-bottom':9}), href="https://www.youtube.com/user/austintexasgov/", target="_blank")),
     ],
     className="ms-auto g-3 pe-4",
     align="center",
@@ -75,7 +88,7 @@ navbar = dbc.Navbar(
             [
                 dbc.Col(
                     html.A(
-                        html.Img(src=app.get_asset_url("plotly-dash-icon.png"), height="30px"),
+                        html.Img(src=assets.asset_url("plotly-dash-icon.png"), height="30px"),
                         href="https://plot.ly",
                         target="_blank"
                     )
@@ -102,5 +115,23 @@ content = html.Div(dash.page_container, style=CONTENT_STYLE)
 
 app.layout = html.Div([dcc.Location(id="url"), sidebar, navbar, content])
 
+# idle detection and statistics for the speculative prefetch of other pages' figures
+prefetch.init_app(app.server)
+
+# the index html validates the callbacks against the pages' component ids, without their prerendered figures
+prerender.init_app(app)
+
+# programmatic export of the aggregates shown on the pages
+app.server.register_blueprint(api)
+
+# built assets, served with long-lived cache headers
+app.server.register_blueprint(assets.assets)
+
+# callback responses and layouts encoded with orjson when FAST_JSON=1
+encoding.init_app()
+
+# render times of the graphs measured in the browser, when TELEMETRY=1
+telemetry.init_app(app.server)
+
 if __name__ == "__main__":
     app.run(debug=False)
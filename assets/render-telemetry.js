@@ -0,0 +1,121 @@
+// time from a callback response carrying a figure to the graph showing it, and the size of the figure,
+// sent in batches to /_telemetry; included when the app runs with TELEMETRY=1
+(function () {
+    const ENDPOINT = "/_telemetry";
+    const BATCH_SIZE = 20;
+    const FLUSH_INTERVAL = 10000;
+
+    // figures received per graph id and not drawn yet; background graphs get theirs through the
+    // "<id>-inline" and "<id>-background" stores
+    const pending = {};
+    let batch = [];
+
+    function graphId(componentId) {
+        return componentId.replace(/-(inline|background)$/, "");
+    }
+
+    function isFigure(value) {
+        return value !== null && typeof value === "object" && Array.isArray(value.data) && "layout" in value;
+    }
+
+    function track(componentId, figure, received) {
+        pending[graphId(componentId)] = {received: received, bytes: JSON.stringify(figure).length};
+    }
+
+    // figures of the graphs in a page layout, as the router callback returns it
+    function walk(value, received) {
+        if (Array.isArray(value)) {
+            value.forEach(v => walk(v, received));
+        } else if (value !== null && typeof value === "object") {
+            if (value.props && typeof value.props.id === "string" && isFigure(value.props.figure)) {
+                track(value.props.id, value.props.figure, received);
+            }
+            Object.values(value.props || {}).forEach(v => walk(v, received));
+        }
+    }
+
+    function onResponse(body, received) {
+        Object.entries(body.response || {}).forEach(([componentId, props]) => {
+            Object.values(props).forEach(value => {
+                if (isFigure(value)) {
+                    track(componentId, value, received);
+                } else {
+                    walk(value, received);
+                }
+            });
+        });
+    }
+
+    function flush(beacon) {
+        if (!batch.length) {
+            return;
+        }
+        const payload = JSON.stringify({measurements: batch});
+        batch = [];
+        if (beacon && navigator.sendBeacon) {
+            navigator.sendBeacon(ENDPOINT, new Blob([payload], {type: "application/json"}));
+        } else {
+            fetch(ENDPOINT, {method: "POST", headers: {"Content-Type": "application/json"}, body: payload, keepalive: true});
+        }
+    }
+
+    function record(id, measurement) {
+        batch.push({
+            page: window.location.pathname,
+            graph: id,
+            render_ms: performance.now() - measurement.received,
+            bytes: measurement.bytes
+        });
+        if (batch.length >= BATCH_SIZE) {
+            flush(false);
+        }
+    }
+
+    // dcc.Graph draws with the global Plotly.react, on the inner div of the element holding the id
+    function wrap(Plotly) {
+        if (!Plotly || Plotly.react.telemetry) {
+            return Plotly;
+        }
+        const react = Plotly.react;
+        Plotly.react = function (gd) {
+            const graph = gd.closest && gd.closest(".dash-graph");
+            const measurement = graph && pending[graph.id];
+            const drawn = react.apply(this, arguments);
+            if (measurement) {
+                delete pending[graph.id];
+                Promise.resolve(drawn).then(() => requestAnimationFrame(() => record(graph.id, measurement)));
+            }
+            return drawn;
+        };
+        Plotly.react.telemetry = true;
+        return Plotly;
+    }
+
+    // plotly.js is loaded with the first graph, after this script
+    let plotly = wrap(window.Plotly);
+    Object.defineProperty(window, "Plotly", {
+        configurable: true,
+        get: () => plotly,
+        set: value => { plotly = wrap(value); }
+    });
+
+    const fetch = window.fetch;
+    window.fetch = function (input) {
+        const response = fetch.apply(this, arguments);
+        const url = typeof input === "string" ? input : input.url;
+        if (url.indexOf("_dash-update-component") !== -1) {
+            response.then(r => {
+                const received = performance.now();
+                return r.clone().json().then(body => onResponse(body, received));
+            }).catch(() => {});
+        }
+        return response;
+    };
+
+    setInterval(() => flush(false), FLUSH_INTERVAL);
+    document.addEventListener("visibilitychange", () => {
+        if (document.visibilityState === "hidden") {
+            flush(true);
+        }
+    });
+})();
@@ -0,0 +1,38 @@
+import os
+from utils import assets
+
+# bytes of the assets fetched on a first visit of the home page, as dash serves them from assets/ and
+# as the built, fingerprinted copies are served; python -m benchmarks.assets
+
+HOME_ASSETS = ['custom.css', 'lottie-cat-homepage.json'] + list(assets.DISPLAY_HEIGHTS)
+
+HEADERS = {'Accept-Encoding': "gzip, deflate, br"}
+
+
+def fetched(client, url):
+    response = client.get(url, headers=HEADERS)
+    assert response.status_code == 200, url
+    return len(response.data), response.headers.get('Content-Encoding', "-"), response.headers.get('Cache-Control', "-")
+
+
+def run():
+    os.environ.setdefault("PREFETCH", "0")
+    from app import app
+
+    client = app.server.test_client()
+    before_total = after_total = 0
+    for name in HOME_ASSETS:
+        before, _, _ = fetched(client, "/assets/" + name)
+        after, encoding, cache = fetched(client, assets.asset_url(name))
+        before_total += before
+        after_total += after
+        print("%-40s %10d B  %10d B  %-5s %s" % (name, before, after, encoding, cache))
+
+    print("%-40s %10d B  %10d B" % ("total", before_total, after_total))
+
+    skipped = sorted(set(os.listdir(assets.ASSETSPATH)) - set(assets.manifest()))
+    print("not referenced, not built: " + ", ".join(skipped))
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,74 @@
+import os
+import sys
+import time
+import shutil
+import tempfile
+import numpy as np
+import pandas as pd
+from utils.data import prepare
+from utils.store import PartitionStore, build_partitions
+from utils.backends import PandasBackend, SQLiteBackend, DuckDBBackend
+from benchmarks.synthetic import make_raw
+from benchmarks.kpi_index import random_query
+
+# the grouped counts of the pages on each query backend over random filters, checking that all of
+# them return the same aggregates; python -m benchmarks.backends [rows ...]
+
+GROUPINGS = [
+    ['outcome_type'],
+    ['Month_Year', 'outcome_type'],
+    ['outcome_type', 'outcome_subtype'],
+    ['breed', 'outcome_type', 'sex_upon_outcome']
+]
+
+
+def make_backends(path):
+    store = PartitionStore(os.path.join(path, "partitions"))
+    backends = {'pandas': PandasBackend(store)}
+
+    started = time.perf_counter()
+    backends['sqlite'] = SQLiteBackend(store, os.path.join(path, "shelter.sqlite"))
+    builds = {'sqlite': time.perf_counter() - started}
+
+    try:
+        backends['duckdb'] = DuckDBBackend(os.path.join(path, "partitions"))
+    except ImportError:
+        pass
+
+    return backends, builds
+
+
+def run(rows, queries=20, seed=0):
+    path = tempfile.mkdtemp()
+    try:
+        make_raw(rows, seed).to_csv(os.path.join(path, "outcomes.csv"), index=False)
+        build_partitions(os.path.join(path, "outcomes.csv"), os.path.join(path, "partitions"), prepare)
+        backends, builds = make_backends(path)
+
+        sample = prepare(make_raw(10000, seed))
+        rng = np.random.default_rng(seed)
+        times = dict.fromkeys(backends, 0.0)
+
+        for _ in range(queries):
+            start_date, end_date, age_range, sexes, breeds = random_query(rng, sample)
+            by = GROUPINGS[rng.integers(len(GROUPINGS))]
+
+            results = dict()
+            for name, backend in backends.items():
+                started = time.perf_counter()
+                results[name] = backend.count(by, start_date=start_date, end_date=end_date, age_range=age_range,
+                    sexes=sexes, breeds=breeds)
+                times[name] += time.perf_counter() - started
+
+            for name, final in results.items():
+                pd.testing.assert_frame_equal(final, results['pandas'], check_dtype=False)
+
+        print("%10d rows  sqlite build %7.3fs  " % (rows, builds['sqlite']) + "  ".join(
+            "%s %8.3fms" % (name, 1000 * total / queries) for name, total in times.items()))
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    for rows in [int(n) for n in sys.argv[1:]] or [10000, 100000, 1000000]:
+        run(rows)
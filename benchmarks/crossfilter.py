@@ -0,0 +1,55 @@
+import sys
+import time
+import numpy as np
+import pandas as pd
+from utils.crossfilter import selected
+from benchmarks.synthetic import make_data
+
+# a click on the subtype bar chart filtering the sunburst: a slice of the page's per-day aggregate, as the
+# page answers it, versus filtering the rows again, checking that both count the same; the slice only
+# depends on the size of the aggregate, not on the rows; python -m benchmarks.crossfilter [rows ...]
+
+
+def requery(df, period, value, subtype):
+    final = df[(df[period].astype(str) == value) & (df['outcome_subtype'] == subtype)]
+    return final.groupby(['outcome_type', 'outcome_subtype'], as_index=False)['count'].sum()
+
+
+def sliced(counts, period, value, subtype):
+    selection = {'source': 'bar-graph', 'values': {period: value, 'outcome_subtype': subtype}}
+    final = selected(counts, selection, ['Date', 'Month_Year', 'Year', 'outcome_subtype'])
+    return final.groupby(['outcome_type', 'outcome_subtype'], as_index=False)['count'].sum()
+
+
+def run(rows, clicks=50, seed=0):
+    df = make_data(rows, seed)
+    rng = np.random.default_rng(seed)
+
+    started = time.perf_counter()
+    counts = df.groupby(['Date', 'outcome_type', 'outcome_subtype'], as_index=False)['count'].sum()
+    aggregate = time.perf_counter() - started
+
+    subtypes = df['outcome_subtype'].dropna().unique()
+    requery_time = sliced_time = 0.0
+    for _ in range(clicks):
+        period = str(rng.choice(['Date', 'Month_Year', 'Year']))
+        value = str(rng.choice(df[period].astype(str).unique()))
+        subtype = str(rng.choice(subtypes))
+
+        started = time.perf_counter()
+        expected = requery(df, period, value, subtype)
+        requery_time += time.perf_counter() - started
+
+        started = time.perf_counter()
+        final = sliced(counts, period, value, subtype)
+        sliced_time += time.perf_counter() - started
+
+        pd.testing.assert_frame_equal(final.reset_index(drop=True), expected.reset_index(drop=True), check_dtype=False)
+
+    print("%10d rows  aggregate %7.3fs (%d rows)  requery %8.3fms  slice %8.3fms" % (
+        rows, aggregate, len(counts), 1000 * requery_time / clicks, 1000 * sliced_time / clicks))
+
+
+if __name__ == "__main__":
+    for rows in [int(n) for n in sys.argv[1:]] or [10000, 100000, 1000000]:
+        run(rows)
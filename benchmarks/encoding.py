@@ -0,0 +1,59 @@
+import os
+import sys
+import time
+from plotly.io.json import to_json_plotly
+from utils.encoding import to_json, fast_to_json, orjson
+
+# encode time of each page's responses: the page layout the router callback returns, and each figure
+# function's outputs with the layout's values, with dash's own encoder (plotly's orjson engine when orjson
+# is installed), the orjson fast path and plotly's json engine, checking that the fast path returns the
+# same bytes as dash's encoder; python -m benchmarks.encoding [repeats]
+
+
+def payloads():
+    import dash
+    from utils import prefetch
+
+    for page in dash.page_registry.values():
+        layout = page['layout']() if callable(page['layout']) else page['layout']
+        yield page['module'], 'layout', {'multi': True, 'response': {'_pages_content': {'children': layout}}}
+
+    for entry in prefetch.registry:
+        outputs = entry['func'].uncached(*(entry['defaults'][i] for i in entry['inputs']))
+        if not isinstance(outputs, tuple):
+            outputs = (outputs,)
+        response = {'output-{}'.format(i): {'figure': output} for i, output in enumerate(outputs)}
+        yield entry['page'], entry['func'].__name__, {'multi': True, 'response': response}
+
+
+def timed(encode, value, repeats):
+    started = time.perf_counter()
+    for _ in range(repeats):
+        encoded = encode(value)
+    return encoded, (time.perf_counter() - started) / repeats
+
+
+def run(repeats=20):
+    if orjson is None:
+        sys.exit("orjson is not installed")
+
+    os.environ.setdefault("PREFETCH", "0")
+    import app
+
+    totals = [0.0, 0.0, 0.0]
+    for page, name, payload in payloads():
+        expected, dash_time = timed(to_json, payload, repeats)
+        encoded, fast_time = timed(fast_to_json, payload, repeats)
+        plotly_json, json_time = timed(lambda value: to_json_plotly(value, engine="json"), payload, repeats)
+        assert encoded == expected, (page, name)
+
+        totals = [t + n for t, n in zip(totals, [dash_time, fast_time, json_time])]
+        print("%-35s %-22s %9d B  dash %8.3fms  fast %8.3fms  plotly json %8.3fms" % (
+            page, name, len(expected), 1000 * dash_time, 1000 * fast_time, 1000 * json_time))
+
+    print("%-35s %-22s %11s  dash %8.3fms  fast %8.3fms  plotly json %8.3fms" % (
+        "total", "", "", *(1000 * t for t in totals)))
+
+
+if __name__ == "__main__":
+    run(*[int(n) for n in sys.argv[1:]])
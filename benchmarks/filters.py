@@ -0,0 +1,57 @@
+import sys
+import time
+import numpy as np
+import pandas as pd
+from utils.planner import FilterSpec, ColumnStats, plan
+from utils.store import FrameStore
+from benchmarks.synthetic import make_data
+from benchmarks.kpi_index import random_query
+
+# the page filters over random queries: the fixed chain of boolean masks, each step copying the rows
+# that are left, versus the planner's selectivity order over row positions, checking that both keep
+# the same rows; python -m benchmarks.filters [rows ...]
+
+
+def chained(df, start_date=None, end_date=None, age_range=None, sexes=None, breeds=None, outcomes=None):
+    final = df[(df['outcome_age_(months)'] >= age_range[0]) & (df['outcome_age_(months)'] <= age_range[1])]
+    if sexes:
+        final = final[final['sex_upon_outcome'].isin(sexes)]
+    if breeds:
+        final = final[final['breed'].isin(breeds)]
+    final = final[(final['Date'] >= start_date) & (final['Date'] <= end_date)]
+    if outcomes:
+        final = final[final['outcome_type'].isin(outcomes)]
+
+    return final
+
+
+def run(rows, queries=50, seed=0):
+    df = make_data(rows, seed)
+    rng = np.random.default_rng(seed)
+
+    started = time.perf_counter()
+    stats = ColumnStats(FrameStore(df))
+    build = time.perf_counter() - started
+
+    chained_time = planned_time = 0.0
+    for _ in range(queries):
+        start_date, end_date, age_range, sexes, breeds = random_query(rng, df)
+        outcomes = [str(rng.choice(df['outcome_type'].unique()))] if rng.random() < 0.5 else None
+
+        started = time.perf_counter()
+        expected = chained(df, start_date, end_date, age_range, sexes, breeds, outcomes)
+        chained_time += time.perf_counter() - started
+
+        started = time.perf_counter()
+        final = plan(FilterSpec(start_date, end_date, age_range, sexes, breeds, outcomes=outcomes), stats).execute(df)
+        planned_time += time.perf_counter() - started
+
+        pd.testing.assert_frame_equal(final, expected)
+
+    print("%10d rows  stats %7.3fs  chained %8.3fms  planned %8.3fms" % (
+        rows, build, 1000 * chained_time / queries, 1000 * planned_time / queries))
+
+
+if __name__ == "__main__":
+    for rows in [int(n) for n in sys.argv[1:]] or [10000, 100000, 1000000]:
+        run(rows)
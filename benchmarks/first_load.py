@@ -0,0 +1,91 @@
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import tempfile
+import urllib.request
+import psutil
+from benchmarks.load import PAGES, Session, components, start_server
+
+# cost of visiting each page with the layout's filter values: size of the index html, callbacks fired and
+# how many of them had nothing to update, time until the first chart can be drawn and until every initial
+# callback has answered, and server cpu; the first visit after the server started and the mean of the
+# following ones; python -m benchmarks.first_load [visits]
+
+CHART_PROPS = ("figure", "data")
+
+
+class TimedSession(Session):
+    # records when the first figure arrives, in the page layout or from a callback
+
+    first_chart = None
+    skipped = 0
+
+    def post(self, payload, params=""):
+        result = super().post(payload, params)
+        if result == dict():
+            self.skipped += 1
+        return result
+
+    def call(self, dependency, changed):
+        changed = super().call(dependency, changed)
+        if self.first_chart is None:
+            if '_pages_content.children' in changed:
+                drawn = any(props.get('figure') for props in components(self.value('_pages_content', 'children')).values())
+            else:
+                drawn = any(c.endswith(CHART_PROPS) for c in changed)
+            if drawn:
+                self.first_chart = time.perf_counter()
+        return changed
+
+
+def server_cpu(server):
+    processes = [server] + server.children(recursive=True)
+    return sum(p.cpu_times().user + p.cpu_times().system for p in processes)
+
+
+def visit(base, dependencies, path, server):
+    latencies, errors = list(), list()
+    session = TimedSession(base, dependencies, random.Random(0), latencies, errors)
+
+    cpu = server_cpu(server)
+    started = time.perf_counter()
+    with urllib.request.urlopen(base + path) as response:
+        index = response.read()
+    session.load(path)
+    finished = time.perf_counter()
+
+    return {
+        'index_kb': len(index) / 1024,
+        'callbacks': len(latencies) - 1,
+        'skipped': session.skipped,
+        'first_chart_ms': 1000 * ((session.first_chart or finished) - started),
+        'all_callbacks_ms': 1000 * (finished - started),
+        'server_cpu_ms': 1000 * (server_cpu(server) - cpu),
+        'errors': len(errors)
+    }
+
+
+def run(visits=5):
+    path = tempfile.mkdtemp()
+    env = dict(os.environ, PREFETCH="0", CACHE_PATH=path)
+    server, base = start_server(1, 1, env)
+    try:
+        with urllib.request.urlopen(base + "/_dash-dependencies") as response:
+            dependencies = json.loads(response.read())
+
+        process = psutil.Process(server.pid)
+        for page in PAGES:
+            results = [visit(base, dependencies, page, process) for _ in range(visits)]
+            later = results[1:] or results
+            print(json.dumps({'page': page, 'first': results[0], 'later': {k: sum(r[k] for r in later) / len(later) for k in later[0]}}))
+    finally:
+        server.terminate()
+        server.wait()
+        shutil.rmtree(path, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    run(*[int(n) for n in sys.argv[1:]])
@@ -0,0 +1,68 @@
+import sys
+import time
+import numpy as np
+import pandas as pd
+from utils.prefix import PrefixIndex
+from utils.store import FrameStore
+from benchmarks.synthetic import make_data
+
+# KPI counts over random date and age ranges: filter and groupby on the frame versus the prefix sums,
+# checking that both agree; python -m benchmarks.kpi_index [rows ...]
+
+
+def pandas_counts(df, start_date, end_date, age_range, sexes, breeds):
+    final = df[(df['outcome_age_(months)'] >= age_range[0]) & (df['outcome_age_(months)'] <= age_range[1])]
+    if sexes:
+        final = final[final['sex_upon_outcome'].isin(sexes)]
+    if breeds:
+        final = final[final['breed'].isin(breeds)]
+    final = final[(final['Date'] >= start_date) & (final['Date'] <= end_date)]
+
+    return final.groupby('outcome_type')['count'].count().to_dict()
+
+
+def random_query(rng, df):
+    days = pd.date_range(df['Date'].min(), df['Date'].max())
+    start, end = sorted(rng.choice(len(days), 2, replace=False))
+    low = int(rng.integers(0, 60))
+    sexes = [str(s) for s in rng.choice(df['sex_upon_outcome'].unique(), 2, replace=False)] if rng.random() < 0.3 else None
+    breeds = [str(b) for b in rng.choice(df['breed'].unique()[:5], 1)] if rng.random() < 0.3 else None
+
+    return str(days[start].date()), str(days[end].date()), [low, low + int(rng.integers(1, 200))], sexes, breeds
+
+
+def run(rows, queries=50, seed=0):
+    df = make_data(rows, seed)
+    rng = np.random.default_rng(seed)
+
+    started = time.perf_counter()
+    index = PrefixIndex(FrameStore(df))
+    build = time.perf_counter() - started
+
+    pandas_time = cold_time = warm_time = 0.0
+    for _ in range(queries):
+        query = random_query(rng, df)
+
+        started = time.perf_counter()
+        expected = pandas_counts(df, *query)
+        pandas_time += time.perf_counter() - started
+
+        # the first query with a sex or breed filter also builds its variant
+        started = time.perf_counter()
+        counts = index.counts(*query)
+        cold_time += time.perf_counter() - started
+
+        started = time.perf_counter()
+        index.counts(*query)
+        warm_time += time.perf_counter() - started
+
+        assert {k: v for k, v in counts.items() if v} == expected, query
+
+    size = index.base.nbytes / 2 ** 20
+    print("%10d rows  build %7.3fs  %6.1f MB  pandas %8.3fms  prefix cold %8.3fms  warm %7.3fms" % (
+        rows, build, size, 1000 * pandas_time / queries, 1000 * cold_time / queries, 1000 * warm_time / queries))
+
+
+if __name__ == "__main__":
+    for rows in [int(n) for n in sys.argv[1:]] or [10000, 100000, 1000000]:
+        run(rows)
@@ -0,0 +1,272 @@
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import socket
+import argparse
+import tempfile
+import threading
+import subprocess
+import urllib.error
+import urllib.request
+import numpy as np
+
+# concurrent user sessions against a locally started gunicorn server: page loads, then slider drags,
+# dropdown changes and radio toggles, each posted to /_dash-update-component with the payloads the
+# browser would send; one json line per server configuration and session count, e.g.
+# python -m benchmarks.load --workers 1 2 4 --threads 1 4 --sessions 1 8 32 > load.jsonl
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PAGES = ["/outcomes-overview", "/outcomes-subtypes-overview", "/distributions", "/outcomes-by-age", "/outcomes-by-breed"]
+
+# components a user interacts with, by dash component type
+ACTIONS = {'RangeSlider': 'drag', 'Dropdown': 'change', 'RadioItems': 'toggle'}
+
+# background callbacks are polled at this interval, as the browser does
+POLL_INTERVAL = 0.5
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(workers, threads, env):
+    port = free_port()
+    server = subprocess.Popen([sys.executable, "-m", "gunicorn", "app:server", "--workers", str(workers),
+        "--threads", str(threads), "--bind", "127.0.0.1:%d" % port, "--timeout", "300"],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    base = "http://127.0.0.1:%d" % port
+    for _ in range(600):
+        try:
+            urllib.request.urlopen(base + "/", timeout=5).read()
+            return server, base
+        except (urllib.error.URLError, ConnectionError):
+            time.sleep(0.5)
+
+    server.kill()
+    raise RuntimeError("the server did not start")
+
+
+def parse_outputs(output):
+    # "a.children" for a single output, "..a.children...b.data.." for several
+    if output.startswith(".."):
+        return [dict(zip(['id', 'property'], o.rsplit('.', 1))) for o in output[2:-2].split('...')]
+    return dict(zip(['id', 'property'], output.rsplit('.', 1)))
+
+
+def components(layout, found=None):
+    # props of every component with an id in a serialized layout
+    found = dict() if found is None else found
+    if isinstance(layout, list):
+        for child in layout:
+            components(child, found)
+    elif isinstance(layout, dict) and 'props' in layout:
+        props = layout['props']
+        if isinstance(props.get('id'), str):
+            found[props['id']] = dict(props, type=layout['type'])
+        components(props.get('children'), found)
+    return found
+
+
+def option_values(props):
+    return [o['value'] if isinstance(o, dict) else o for o in props.get('options') or []]
+
+
+class Session:
+    # one browser tab: the state of the page's components and the callbacks they trigger
+
+    def __init__(self, base, dependencies, rng, latencies, errors):
+        self.base = base
+        self.dependencies = [d for d in dependencies if not d.get('clientside_function')]
+        self.rng = rng
+        self.latencies = latencies
+        self.errors = errors
+        self.state = dict()
+
+    def post(self, payload, params=""):
+        started = time.perf_counter()
+        try:
+            request = urllib.request.Request(self.base + "/_dash-update-component" + params, json.dumps(payload).encode(),
+                {'Content-Type': "application/json"})
+            with urllib.request.urlopen(request, timeout=300) as response:
+                body = response.read()
+            self.latencies.append(time.perf_counter() - started)
+            return json.loads(body) if body else dict()
+        except (urllib.error.URLError, ConnectionError, ValueError):
+            self.latencies.append(time.perf_counter() - started)
+            self.errors.append(1)
+            return None
+
+    def value(self, component_id, prop):
+        return self.state.get(component_id, {}).get(prop)
+
+    def call(self, dependency, changed):
+        outputs = parse_outputs(dependency['output'])
+        payload = {
+            'output': dependency['output'],
+            'outputs': outputs,
+            'inputs': [dict(i, value=self.value(i['id'], i['property'])) for i in dependency['inputs']],
+            'changedPropIds': changed,
+            'state': [dict(s, value=self.value(s['id'], s['property'])) for s in dependency['state']]
+        }
+
+        result = self.post(payload)
+        # background callbacks answer with a job to poll until its result is ready, an empty response
+        # meaning that it was cancelled
+        if result and 'cacheKey' in result:
+            query = "?cacheKey=%s&job=%s" % (result['cacheKey'], result['job'])
+            result = {'multi': True}
+            while result and 'response' not in result:
+                time.sleep(POLL_INTERVAL)
+                result = self.post(payload, query)
+
+        if not result or 'response' not in result:
+            return list()
+
+        changed = list()
+        for component_id, props in result['response'].items():
+            self.state.setdefault(component_id, {}).update(props)
+            changed += [component_id + "." + prop for prop in props]
+        return changed
+
+    def ready(self, dependency):
+        # the browser only calls the callbacks whose inputs and outputs are all on the page
+        outputs = parse_outputs(dependency['output'])
+        outputs = outputs if isinstance(outputs, list) else [outputs]
+        return all(c['id'] in self.state for c in dependency['inputs'] + outputs)
+
+    def propagate(self, changed, initial=False):
+        # fire the callbacks of the changed properties, then those of their outputs
+        fired = set()
+        while changed or initial:
+            pending = list()
+            for dependency in self.dependencies:
+                if dependency['output'] in fired or not self.ready(dependency):
+                    continue
+                inputs = [i['id'] + "." + i['property'] for i in dependency['inputs']]
+                triggered = [c for c in changed if c in inputs]
+                if triggered or (initial and not dependency.get('prevent_initial_call')):
+                    fired.add(dependency['output'])
+                    pending += self.call(dependency, triggered)
+            changed, initial = pending, False
+
+    def load(self, path):
+        router = next(d for d in self.dependencies if d['output'].startswith('.._pages_content.children'))
+        self.state = {'_pages_location': {'pathname': path, 'search': ""}}
+        self.call(router, ['_pages_location.pathname'])
+        self.state.update(components(self.value('_pages_content', 'children')))
+        self.propagate(list(), initial=True)
+
+    def interact(self):
+        inputs = {i['id'] for d in self.dependencies for i in d['inputs']}
+        targets = [c for c in self.state if c in inputs and self.state[c].get('type') in ACTIONS]
+        if not targets:
+            return
+
+        component_id = self.rng.choice(targets)
+        props = self.state[component_id]
+
+        if props['type'] == 'RangeSlider':
+            low, high = props.get('min', 0), props.get('max', 100)
+            value = sorted(self.rng.uniform(low, high) for _ in range(2))
+            props['value'] = [round(v) for v in value]
+        elif props['type'] == 'Dropdown':
+            options = option_values(props)
+            if not options:
+                return
+            if props.get('multi'):
+                props['value'] = self.rng.sample(options, min(len(options), self.rng.randint(0, 3)))
+            else:
+                props['value'] = self.rng.choice(options)
+        else:
+            props['value'] = self.rng.choice(option_values(props) or [props.get('value')])
+
+        self.propagate([component_id + ".value"])
+
+
+def run_sessions(base, sessions, duration, actions, think, seed):
+    with urllib.request.urlopen(base + "/_dash-dependencies") as response:
+        dependencies = json.loads(response.read())
+
+    latencies, errors = list(), list()
+    deadline = time.perf_counter() + duration
+
+    def user(n):
+        rng = random.Random(seed + n)
+        session = Session(base, dependencies, rng, latencies, errors)
+        while time.perf_counter() < deadline:
+            session.load(rng.choice(PAGES))
+            for _ in range(actions):
+                if time.perf_counter() >= deadline:
+                    break
+                time.sleep(think)
+                session.interact()
+
+    started = time.perf_counter()
+    users = [threading.Thread(target=user, args=(n,), daemon=True) for n in range(sessions)]
+    for thread in users:
+        thread.start()
+    for thread in users:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    times = np.array(latencies) * 1000 if latencies else np.zeros(1)
+    return {
+        'requests': len(latencies),
+        'throughput': len(latencies) / elapsed,
+        'p50_ms': float(np.percentile(times, 50)),
+        'p90_ms': float(np.percentile(times, 90)),
+        'p99_ms': float(np.percentile(times, 99)),
+        'max_ms': float(times.max()),
+        'error_rate': len(errors) / max(len(latencies), 1)
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="load test of the dashboard with concurrent user sessions")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--duration", type=float, default=30, help="seconds per session count")
+    parser.add_argument("--actions", type=int, default=10, help="interactions per page visit")
+    parser.add_argument("--think", type=float, default=0.0, help="seconds between interactions")
+    parser.add_argument("--rows", type=int, help="run on synthetic data of this size instead of data/")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    path = tempfile.mkdtemp()
+    try:
+        env = dict(os.environ, PREFETCH=os.environ.get("PREFETCH", "0"))
+        if args.rows:
+            from benchmarks.synthetic import make_raw
+            make_raw(args.rows, args.seed).to_csv(os.path.join(path, "animal-shelter-data.csv"), index=False)
+            env['DATA_PATH'] = path
+            env['CACHE_PATH'] = tempfile.mkdtemp(dir=path)
+            subprocess.run([sys.executable, "-c", "from utils.data import get_store; get_store()"], cwd=ROOT, env=env, check=True)
+
+        for workers in args.workers:
+            for threads in args.threads:
+                for sessions in args.sessions:
+                    # every run starts from empty figure and background caches
+                    env['CACHE_PATH'] = tempfile.mkdtemp(dir=path)
+                    server, base = start_server(workers, threads, env)
+                    try:
+                        result = run_sessions(base, sessions, args.duration, args.actions, args.think, args.seed)
+                    finally:
+                        server.terminate()
+                        server.wait()
+
+                    print(json.dumps(dict({'workers': workers, 'threads': threads, 'sessions': sessions,
+                        'rows': args.rows}, **result)), flush=True)
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
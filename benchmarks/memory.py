@@ -0,0 +1,151 @@
+import os
+import sys
+import json
+import shutil
+import tempfile
+import importlib.util
+import subprocess
+import tracemalloc
+import psutil
+
+# memory of the dashboard on the synthetic data: resident memory added by importing each page module,
+# peak allocation of each page's figure functions (tracemalloc) and of the filters behind them,
+# checked against budgets; python -m benchmarks.memory [rows ...] exits with 1 when one is exceeded
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PAGES = os.path.join(ROOT, "pages")
+
+# budgets in MB, a fixed part plus a part per million rows of data; a json file named by
+# MEMORY_BUDGETS can override any of them or set one for a single page or function, e.g.
+# {"callback": [20, 150], "pages.outcomes_overview.gross_outcomes_figure": [60, 300]}
+BUDGETS = {
+    'import': [40, 300],
+    'callback': [60, 400],
+    'filter': [10, 150]
+}
+
+# filters of the filter measurement, on top of the full date and age range
+FILTERS = {
+    'age': {'age_range': [0, 12]},
+    'age+sex': {'age_range': [0, 12], 'sexes': ['Spayed Female', 'Neutered Male']},
+    'age+sex+breed': {'age_range': [0, 12], 'sexes': ['Spayed Female', 'Neutered Male'], 'breeds': ['domestic shorthair']}
+}
+
+
+def megabytes(n):
+    return n / 2 ** 20
+
+
+def rss():
+    return psutil.Process().memory_info().rss
+
+
+def traced_peak(func, *args, **kwargs):
+    # peak of the memory allocated during the call, above what was allocated before it
+    tracemalloc.reset_peak()
+    before = tracemalloc.get_traced_memory()[0]
+    result = func(*args, **kwargs)
+    return result, tracemalloc.get_traced_memory()[1] - before
+
+
+def measure():
+    # runs in a fresh interpreter with DATA_PATH set, so that resident memory is only the dashboard's
+    import dash
+    import plotly.express
+    from utils.background import background_callback_manager
+    from utils.data import get_store, get_stats, filter_data
+    from utils import prefetch
+
+    results = list()
+
+    # pages register themselves with the app, as dash.Dash(use_pages=True) would import them
+    dash.Dash(__name__, background_callback_manager=background_callback_manager)
+    store = get_store()
+
+    # state every page shares is set up before, rather than counted against the first page imported:
+    # the filter statistics and the partitions the store keeps in memory
+    get_stats()
+    store.load()
+
+    for file in sorted(os.listdir(PAGES)):
+        if not file.endswith(".py") or file.startswith("_"):
+            continue
+
+        before = rss()
+        spec = importlib.util.spec_from_file_location("pages." + file[:-3], os.path.join(PAGES, file))
+        spec.loader.exec_module(importlib.util.module_from_spec(spec))
+        results.append({'kind': 'import', 'name': "pages." + file[:-3], 'mb': megabytes(rss() - before)})
+
+    tracemalloc.start()
+
+    # each figure function with the layout's values, bypassing the figure cache
+    for entry in prefetch.registry:
+        args = tuple(entry['defaults'][i] for i in entry['inputs'])
+        _, peak = traced_peak(entry['func'].uncached, *args)
+        results.append({'kind': 'callback', 'name': entry['page'] + "." + entry['func'].__name__, 'mb': megabytes(peak)})
+
+    # temporaries of the planned filters: a mask per step over the rows that are left, and one copy at the end
+    data = store.load()
+    for name, filters in FILTERS.items():
+        final, peak = traced_peak(filter_data, data, **filters)
+        kept = final.memory_usage(deep=False, index=True).sum()
+        results.append({'kind': 'filter', 'name': name, 'mb': megabytes(peak), 'result_mb': megabytes(kept)})
+
+    tracemalloc.stop()
+    results.append({'kind': 'total', 'name': 'rss', 'mb': megabytes(rss())})
+
+    print(json.dumps(results))
+
+
+def budgets():
+    limits = dict(BUDGETS)
+    if os.environ.get("MEMORY_BUDGETS"):
+        with open(os.environ["MEMORY_BUDGETS"]) as f:
+            limits.update(json.load(f))
+    return limits
+
+
+def run(rows, seed=0):
+    from benchmarks.synthetic import make_raw
+
+    path = tempfile.mkdtemp()
+    try:
+        make_raw(rows, seed).to_csv(os.path.join(path, "animal-shelter-data.csv"), index=False)
+
+        # partitions are built once, before the measured run; figures are cached next to the data, away
+        # from the dashboard's own cache
+        env = dict(os.environ, DATA_PATH=path, CACHE_PATH=os.path.join(path, "cache"), PREFETCH="0")
+        subprocess.run([sys.executable, "-c", "from utils.data import get_store; get_store()"], cwd=ROOT, env=env, check=True)
+        output = subprocess.run([sys.executable, "-m", "benchmarks.memory", "--measure"], cwd=ROOT, env=env,
+            check=True, stdout=subprocess.PIPE).stdout
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+
+    limits = budgets()
+    failures = 0
+    print("%d rows" % rows)
+    for result in json.loads(output.decode().strip().splitlines()[-1]):
+        line = "  %-8s %-55s %8.1f MB" % (result['kind'], result['name'], result['mb'])
+        if 'result_mb' in result:
+            line += "  (result %.1f MB)" % result['result_mb']
+
+        budget = limits.get(result['name'], limits.get(result['kind']))
+        if budget:
+            base, per_million = budget
+            limit = base + per_million * rows / 1e6
+            line += "  budget %8.1f MB" % limit
+            if result['mb'] > limit:
+                line += "  OVER BUDGET"
+                failures += 1
+
+        print(line)
+
+    return failures
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ["--measure"]:
+        measure()
+    else:
+        failures = sum(run(rows) for rows in [int(n) for n in sys.argv[1:]] or [10000, 100000, 1000000])
+        sys.exit(1 if failures else 0)
@@ -0,0 +1,98 @@
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import subprocess
+import pandas as pd
+
+# the count queries of the pages over the full history on the synthetic data, answered by the pandas
+# backend in this process and by the sharded backend with an increasing number of worker processes,
+# checking that both return the same counts; python -m benchmarks.sharding [rows ...]
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# the groupbys of the page callbacks, with their usual filters
+QUERIES = {
+    'subtypes': (["Date", "outcome_type", "outcome_subtype"], {'age_range': [0, 12]}),
+    'breeds': (["breed", "outcome_type", "sex_upon_outcome"], {'age_range': [0, 24], 'cfa': True}),
+    'overview': (["Month_Year", "outcome_type"], {'age_range': [0, 12]}),
+    'years': (["Year", "outcome_type"], {})
+}
+
+REPEATS = 3
+
+# rows of synthetic data generated at a time
+CHUNK_ROWS = 1000000
+
+
+def timed(backend, by, filters):
+    started = time.perf_counter()
+    for _ in range(REPEATS):
+        final = backend.count(by, **filters)
+    return final, (time.perf_counter() - started) / REPEATS
+
+
+def measure():
+    # runs with DATA_PATH set to the synthetic data; the partitions of the single process are all kept in memory too
+    from utils.backends import PandasBackend, ShardedBackend
+    from utils.data import PARTITIONPATH, get_store
+    from utils.store import PartitionStore
+
+    store = get_store()
+    partitions = len(store.metadata['partitions'])
+    single = PandasBackend(PartitionStore(PARTITIONPATH, cache_size=partitions))
+
+    results, expected = list(), dict()
+    for name, (by, filters) in QUERIES.items():
+        single.count(by, **filters)
+        expected[name], seconds = timed(single, by, filters)
+        results.append({'shards': 0, 'query': name, 'ms': 1000 * seconds})
+
+    shards = 1
+    while shards <= min(max(os.cpu_count() or 1, 2), partitions):
+        backend = ShardedBackend(store, shards=shards)
+        for name, (by, filters) in QUERIES.items():
+            backend.count(by, **filters)
+            final, seconds = timed(backend, by, filters)
+            pd.testing.assert_frame_equal(final, expected[name])
+            results.append({'shards': len(backend.shards), 'query': name, 'ms': 1000 * seconds})
+        backend.close()
+        shards *= 2
+
+    print(json.dumps(results))
+
+
+def run(rows, seed=0):
+    from benchmarks.synthetic import make_raw
+
+    path = tempfile.mkdtemp()
+    try:
+        csv = os.path.join(path, "animal-shelter-data.csv")
+        for i, start in enumerate(range(0, rows, CHUNK_ROWS)):
+            make_raw(min(CHUNK_ROWS, rows - start), seed + i).to_csv(csv, mode='a', header=i == 0, index=False)
+
+        env = dict(os.environ, DATA_PATH=path, PREFETCH="0")
+        subprocess.run([sys.executable, "-c", "from utils.data import get_store; get_store()"], cwd=ROOT, env=env, check=True)
+        output = subprocess.run([sys.executable, "-m", "benchmarks.sharding", "--measure"], cwd=ROOT, env=env,
+            check=True, stdout=subprocess.PIPE).stdout
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+
+    results = json.loads(output.decode().strip().splitlines()[-1])
+    single = {result['query']: result['ms'] for result in results if result['shards'] == 0}
+
+    print("%d rows, %d cores" % (rows, os.cpu_count() or 1))
+    for result in results:
+        print("  %-10s %-18s %9.1f ms  speedup %5.2fx" % (result['query'],
+            "single process" if result['shards'] == 0 else "%d shards" % result['shards'],
+            result['ms'], single[result['query']] / result['ms']))
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ["--measure"]:
+        measure()
+    else:
+        for rows in [int(n) for n in sys.argv[1:]] or [10000000]:
+            run(rows)
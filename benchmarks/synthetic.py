@@ -0,0 +1,72 @@
+import sys
+import numpy as np
+import pandas as pd
+from utils.data import prepare
+
+# synthetic shelter outcomes with the columns of animal-shelter-data.csv, for benchmarks at any scale;
+# python -m benchmarks.synthetic 1000000 data/animal-shelter-data.csv writes one to disk
+
+OUTCOMES = {
+    'Adoption': ['Foster', 'Offsite', None],
+    'Transfer': ['Partner', 'SCRP', 'Snr'],
+    'Return to Owner': [None],
+    'Euthanasia': ['Suffering', 'Medical', 'Rabies Risk', 'Aggressive'],
+    'Died': ['In Kennel', 'In Foster', 'Enroute'],
+    'Rto-Adopt': [None],
+    'Missing': ['In Foster', 'Possible Theft'],
+    'Disposal': [None]
+}
+OUTCOME_WEIGHTS = [0.42, 0.40, 0.05, 0.07, 0.03, 0.01, 0.01, 0.01]
+
+SEXES = ['Neutered Male', 'Spayed Female', 'Intact Male', 'Intact Female', 'Unknown']
+COLOURS = ['Brown Tabby', 'Black', 'Black/White', 'Orange Tabby', 'Calico', 'Tortie', 'Blue', 'White', 'Blue Tabby', 'Cream Tabby']
+BREEDS = ['domestic shorthair', 'domestic mediumhair', 'domestic longhair', 'siamese', 'maine coon', 'snowshoe',
+    'russian blue', 'manx', 'american shorthair', 'ragdoll', 'persian', 'bengal', 'himalayan', 'balinese']
+
+
+def make_raw(rows, seed=0, start="2013-10-01", years=5, extra_breeds=100):
+    rng = np.random.default_rng(seed)
+
+    # long tail of rare breeds after a few common ones
+    breeds = BREEDS + ['breed {}'.format(i) for i in range(extra_breeds)]
+    breed_weights = 1 / np.arange(1, len(breeds) + 1) ** 1.5
+    breed_weights /= breed_weights.sum()
+
+    seconds = rng.integers(0, years * 365 * 24 * 3600, rows)
+    datetimes = pd.Timestamp(start) + pd.to_timedelta(seconds, unit='s')
+
+    outcome_types = np.array(list(OUTCOMES), dtype=object)[rng.choice(len(OUTCOMES), rows, p=OUTCOME_WEIGHTS)]
+    subtypes = np.empty(rows, dtype=object)
+    for outcome, values in OUTCOMES.items():
+        mask = outcome_types == outcome
+        subtypes[mask] = np.array(values, dtype=object)[rng.integers(0, len(values), mask.sum())]
+
+    # mostly kittens, with a long tail of adults
+    ages = np.where(rng.random(rows) < 0.6, rng.integers(0, 365, rows), rng.integers(365, 20 * 365, rows))
+
+    breed = np.array(breeds, dtype=object)[rng.choice(len(breeds), rows, p=breed_weights)]
+
+    return pd.DataFrame({
+        'datetime': datetimes.strftime('%Y-%m-%d %H:%M:%S'),
+        'outcome_age_(days)': ages,
+        'outcome_type': outcome_types,
+        'outcome_subtype': subtypes,
+        'sex_upon_outcome': np.array(SEXES, dtype=object)[rng.integers(0, len(SEXES), rows)],
+        'breed': breed,
+        'color': np.array(COLOURS, dtype=object)[rng.integers(0, len(COLOURS), rows)],
+        'cfa_breed': ~pd.Series(breed).str.startswith('breed ').values | (rng.random(rows) < 0.1),
+        'count': 1,
+        'outcome_weekday': datetimes.day_name(),
+        'outcome_month': datetimes.month,
+        'outcome_year': datetimes.year,
+        'outcome_hour': datetimes.hour
+    })
+
+
+def make_data(rows, seed=0, **kwargs):
+    # same derived columns as the dashboard's data
+    return prepare(make_raw(rows, seed, **kwargs))
+
+
+if __name__ == "__main__":
+    make_raw(int(sys.argv[1])).to_csv(sys.argv[2], index=False)
@@ -6,6 +6,12 @@ import plotly.express as px
 import plotly.graph_objects as go
 import dash_bootstrap_components as dbc
 from dateutil.relativedelta import relativedelta
+from utils.data import get_store
+from utils.search import search_dropdown
+from utils.backends import get_backend
+from utils.cache import cached_figure
+from utils import prefetch
+from utils.prerender import render, skip_prerendered
 
 dash.register_page(
     __name__,
@@ -14,25 +20,16 @@ dash.register_page(
     name="Distributions"
 )
 
-DATAPATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "../data")
-
-# data transformation
-df = pd.read_csv(os.path.join(DATAPATH,"animal-shelter-data.csv"), index_col=False)
-df["outcome_age_(months)"] = round(df["outcome_age_(days)"]/30)
-df["raw_date"] = df["datetime"].str.split(' ').str[0]
-df["Date"] = pd.to_datetime(df.raw_date)
-df['Month'] = df['Date'].dt.month_name()
-df['Year'] = df['Date'].dt.strftime('%Y')
-df['Month_Year'] = df['Month']+'-'+df['Year'].astype(str)
+# partitioned data, shared by all pages
+store = get_store()
 
 # values for date pickers
-start_date = min(df["Date"])
+start_date = store.min_date
 end_date = pd.Timestamp(start_date.date() + relativedelta(months=+12))
 
 # values for dropdown menus
-sexes = df['sex_upon_outcome'].unique().tolist()
-breeds = df['breed'].unique().tolist()
-outcomes = df['outcome_type'].unique().tolist()
+sexes = store.values('sex_upon_outcome')
+outcomes = store.values('outcome_type')
 
 # third page content
 layout = html.Div([
@@ -45,9 +42,9 @@ layout = html.Div([
             dcc.DatePickerRange(
                 id="date-picker-range",
                 start_date = start_date,
-                min_date_allowed = min(df["Date"]),
+                min_date_allowed = store.min_date,
                 end_date = end_date,
-                max_date_allowed = max(df["Date"]),
+                max_date_allowed = store.max_date,
                 persistence=True, persistence_type="local"
             )
         ], width=3),
@@ -55,9 +52,9 @@ layout = html.Div([
             html.Label("Age on outcome (months)"),
             dcc.RangeSlider(
                 id="range-slider",
-                min=min(df['outcome_age_(months)']),
-                max=max(df['outcome_age_(months)']),
-                value=[min(df['outcome_age_(months)']), 12],
+                min=store.min_age,
+                max=store.max_age,
+                value=[store.min_age, 12],
                 tooltip={"placement": "bottom", "always_visible": True},
                 persistence=True, persistence_type="local"
             )
@@ -73,9 +70,8 @@ layout = html.Div([
             )
         ], width=2),
         dbc.Col([
-            dcc.Dropdown(
-                id="dropdown-breed",
-                options=breeds,
+            search_dropdown(
+                "dropdown-breed", "breed",
                 placeholder="Select breed",
                 multi=True,
                 persistence=True, persistence_type="local"
@@ -144,21 +140,13 @@ layout = html.Div([
             Input("dropdown-breed", "value"),
             Input("dropdown-outcome-dist", "value")])
 def update_secondary_dropdowns(start_date, end_date, slider_value, dropdown1_value, dropdown2_value, outcome_value):
-    # filter by slider selection
-    final = df[(df['outcome_age_(months)'] >= slider_value[0]) & (df['outcome_age_(months)'] <= slider_value[1])]
-
-    # filter by dropdown selections
-    if (dropdown1_value != None):
-        if (len(dropdown1_value) > 0):
-            final = final[final['sex_upon_outcome'].isin(dropdown1_value)]
-
-    if (dropdown2_value != None):
-        if (len(dropdown2_value) > 0):
-            final = final[final['breed'].isin(dropdown2_value)]
+    skip_prerendered(defaults)
+    return secondary_options(start_date, end_date, slider_value, dropdown1_value, dropdown2_value, outcome_value)
 
-    # create new groupby data table with appropriate values for sunburst chart
-    final = final[(final['Date'] >= start_date) & (final['Date'] <= end_date)]
-    final = final[final['outcome_type'] == outcome_value]
+@cached_figure
+def secondary_options(start_date, end_date, slider_value, dropdown1_value, dropdown2_value, outcome_value):
+    final = get_backend().rows(['outcome_weekday', 'outcome_month', 'outcome_year'], start_date=start_date, end_date=end_date,
+        age_range=slider_value, sexes=dropdown1_value, breeds=dropdown2_value, outcomes=[outcome_value])
 
     options1 = final['outcome_weekday'].unique().tolist()
     options2 = final['outcome_month'].unique().tolist()
@@ -180,21 +168,25 @@ def update_secondary_dropdowns(start_date, end_date, slider_value, dropdown1_val
             Input("dropdown-col2", "value"),
             Input("dropdown-col3", "value")])
 def update_histograms(start_date, end_date, slider_value, dropdown1_value, dropdown2_value, outcome_value, dropdown_col1, dropdown_col2, dropdown_col3):
-    # filter by slider selection
-    final = df[(df['outcome_age_(months)'] >= slider_value[0]) & (df['outcome_age_(months)'] <= slider_value[1])]
-
-    # filter by dropdown selections
-    if (dropdown1_value != None):
-        if (len(dropdown1_value) > 0):
-            final = final[final['sex_upon_outcome'].isin(dropdown1_value)]
-
-    if (dropdown2_value != None):
-        if (len(dropdown2_value) > 0):
-            final = final[final['breed'].isin(dropdown2_value)]
-
-    # create new groupby data table with appropriate values for sunburst chart
-    final = final[(final['Date'] >= start_date) & (final['Date'] <= end_date)]
-    final = final[final['outcome_type'] == outcome_value]
+    skip_prerendered(defaults)
+    figs = histograms(start_date, end_date, slider_value, dropdown1_value, dropdown2_value, outcome_value, dropdown_col1, dropdown_col2, dropdown_col3)
+
+    # warm the other pages for the filters persisted by this one
+    prefetch.schedule(__name__, {
+        "date-picker-range.start_date": start_date,
+        "date-picker-range.end_date": end_date,
+        "range-slider.value": slider_value,
+        "dropdown-sex.value": dropdown1_value,
+        "dropdown-breed.value": dropdown2_value
+    })
+
+    return figs
+
+@cached_figure
+def histograms(start_date, end_date, slider_value, dropdown1_value, dropdown2_value, outcome_value, dropdown_col1, dropdown_col2, dropdown_col3):
+    final = get_backend().rows(['outcome_hour', 'outcome_subtype', 'outcome_weekday', 'outcome_month', 'outcome_year'],
+        start_date=start_date, end_date=end_date, age_range=slider_value, sexes=dropdown1_value, breeds=dropdown2_value,
+        outcomes=[outcome_value])
 
     # filter by user-selection in the secondary dropdowns
     hours_df = final
@@ -220,3 +212,26 @@ def update_histograms(start_date, end_date, slider_value, dropdown1_value, dropd
     month.update_layout({'plot_bgcolor': 'rgba(0, 0, 0, 0)', 'paper_bgcolor': 'rgba(0, 0, 0, 0)'})
 
     return hour, weekday, month
+
+# figures prefetched when another page changes the shared filters
+defaults = {
+    "date-picker-range.start_date": start_date,
+    "date-picker-range.end_date": end_date,
+    "range-slider.value": [store.min_age, 12],
+    "dropdown-sex.value": None,
+    "dropdown-breed.value": None,
+    "dropdown-outcome-dist.value": outcomes[1],
+    "dropdown-col1.value": None,
+    "dropdown-col2.value": None,
+    "dropdown-col3.value": None
+}
+
+prefetch.register(__name__, secondary_options, ["date-picker-range.start_date", "date-picker-range.end_date",
+    "range-slider.value", "dropdown-sex.value", "dropdown-breed.value", "dropdown-outcome-dist.value"], defaults)
+prefetch.register(__name__, histograms, ["date-picker-range.start_date", "date-picker-range.end_date",
+    "range-slider.value", "dropdown-sex.value", "dropdown-breed.value", "dropdown-outcome-dist.value",
+    "dropdown-col1.value", "dropdown-col2.value", "dropdown-col3.value"], defaults)
+
+# figures and options for the layout's values, so that a first visit needs no callback
+layout["dropdown-col1"].options, layout["dropdown-col2"].options, layout["dropdown-col3"].options = render(secondary_options)
+layout["hist-hour"].figure, layout["hist-weekday"].figure, layout["hist-month"].figure = render(histograms)
@@ -3,6 +3,7 @@ from dash import dcc, html
 import dash_extensions as de
 import dash_bootstrap_components as dbc
 from dash.dependencies import Input, Output, State
+from utils.assets import asset_url
 
 dash.register_page(
     __name__,
@@ -16,7 +17,7 @@ options = dict(loop=True, autoplay=True) #rendererSettings=dict(preserveAspectRa
 layout = html.Div([
     dbc.Row([
         dbc.Col([
-            de.Lottie(options=options, width="80%", height="80%", url="assets/lottie-cat-homepage.json")
+            de.Lottie(options=options, width="80%", height="80%", url=asset_url("lottie-cat-homepage.json"))
         ], width={'size':4}),
         dbc.Col([
             html.H1("Dash Summer Challenge", className="text-center font-weight-bold", title="Austin Animal Center | Austin Texas Government", style={'font-size':'120px'})
@@ -6,6 +6,13 @@ import plotly.express as px
 import plotly.graph_objects as go
 import dash_bootstrap_components as dbc
 from dateutil.relativedelta import relativedelta
+from utils.data import get_store, period_values
+from utils.search import search_dropdown
+from utils.crossfilter import CrossFilter, selected
+from utils.backends import get_backend
+from utils.cache import cached_figure
+from utils import prefetch
+from utils.prerender import render, skip_prerendered
 
 dash.register_page(
     __name__,
@@ -14,29 +21,20 @@ dash.register_page(
     name="Outcome Subtypes"
 )
 
-DATAPATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "../data")
-
-# data transformation
-df = pd.read_csv(os.path.join(DATAPATH,"animal-shelter-data.csv"), index_col=False)
-df["outcome_age_(months)"] = round(df["outcome_age_(days)"]/30)
-df["raw_date"] = df["datetime"].str.split(' ').str[0]
-df["Date"] = pd.to_datetime(df.raw_date)
-df['Month'] = df['Date'].dt.month_name()
-df['Year'] = df['Date'].dt.strftime('%Y')
-df['Month_Year'] = df['Month']+'-'+df['Year'].astype(str)
+# partitioned data, shared by all pages
+store = get_store()
 
 # values for date pickers
-start_date = min(df["Date"])
+start_date = store.min_date
 end_date = pd.Timestamp(start_date.date() + relativedelta(months=+12))
 
 # values for dropdown menus
-sexes = df['sex_upon_outcome'].unique().tolist()
-breeds = df['breed'].unique().tolist()
-outcomes = df['outcome_type'].unique().tolist()
+sexes = store.values('sex_upon_outcome')
+outcomes = store.values('outcome_type')
 
 # sorting of stacked bar chart x-axis
 months_order = ['January', 'February', 'March', 'April', 'May', 'June', 'July', 'August', 'September', 'October', 'November', 'December']
-years = df['Year'].unique().tolist()
+years = store.values('Year')
 years = sorted(years)
 
 sorted_month_year = list()
@@ -44,6 +42,19 @@ for i in range(len(years)):
     for j in range(len(months_order)):
         sorted_month_year.append(months_order[j] + '-' + str(years[i]))
 
+# clicking a wedge of the sunburst shows its outcome type (and subtype) on the bar chart, clicking a bar
+# filters the sunburst to its period and subtype
+crossfilter = CrossFilter("subtypes-selection", {
+    "sunburst-graph": ["outcome_type", "outcome_subtype"],
+    "bar-graph": None
+}, [Input("date-picker-range", "start_date"),
+    Input("date-picker-range", "end_date"),
+    Input("range-slider", "value"),
+    Input("dropdown-sex", "value"),
+    Input("dropdown-breed", "value"),
+    Input("dropdown-outcome-subtypes", "value"),
+    Input("radio-items-subtypes", "value")])
+
 # second page content
 layout = html.Div([
     html.H3("Overview of Outcome Subtypes"),
@@ -55,9 +66,9 @@ layout = html.Div([
             dcc.DatePickerRange(
                 id="date-picker-range",
                 start_date = start_date,
-                min_date_allowed = min(df["Date"]),
+                min_date_allowed = store.min_date,
                 end_date = end_date,
-                max_date_allowed = max(df["Date"]),
+                max_date_allowed = store.max_date,
                 persistence=True, persistence_type="local"
             )
         ], width=3),
@@ -65,9 +76,9 @@ layout = html.Div([
             html.Label("Age on outcome (months)"),
             dcc.RangeSlider(
                 id="range-slider",
-                min=min(df['outcome_age_(months)']),
-                max=max(df['outcome_age_(months)']),
-                value=[min(df['outcome_age_(months)']), 12],
+                min=store.min_age,
+                max=store.max_age,
+                value=[store.min_age, 12],
                 tooltip={"placement": "bottom", "always_visible": True},
                 persistence=True, persistence_type="local"
             )
@@ -83,9 +94,8 @@ layout = html.Div([
             )
         ], width=2),
         dbc.Col([
-            dcc.Dropdown(
-                id="dropdown-breed",
-                options=breeds,
+            search_dropdown(
+                "dropdown-breed", "breed",
                 placeholder="Select breed",
                 multi=True,
                 persistence=True, persistence_type="local"
@@ -129,6 +139,7 @@ layout = html.Div([
         "Select an outcome type",
         target="dropdown-outcome-subtypes"
     ),
+    crossfilter.component()
 ])
 
 @callback(Output("sunburst-graph", "figure"),
@@ -136,23 +147,39 @@ layout = html.Div([
             Input("date-picker-range", "end_date"),
             Input("range-slider", "value"),
             Input("dropdown-sex", "value"),
-            Input("dropdown-breed", "value")])
-def update_sunburst(start_date, end_date, slider_value, dropdown1_value, dropdown2_value):
-    # filter by slider selection
-    final = df[(df['outcome_age_(months)'] >= slider_value[0]) & (df['outcome_age_(months)'] <= slider_value[1])]
+            Input("dropdown-breed", "value"),
+            crossfilter.input()])
+def update_sunburst(start_date, end_date, slider_value, dropdown1_value, dropdown2_value, selection):
+    skip_prerendered(defaults)
+    fig = sunburst_chart(start_date, end_date, slider_value, dropdown1_value, dropdown2_value,
+        crossfilter.selection_for("sunburst-graph", selection))
+
+    # warm the other pages for the filters persisted by this one
+    prefetch.schedule(__name__, {
+        "date-picker-range.start_date": start_date,
+        "date-picker-range.end_date": end_date,
+        "range-slider.value": slider_value,
+        "dropdown-sex.value": dropdown1_value,
+        "dropdown-breed.value": dropdown2_value
+    })
+
+    return fig
 
-    # filter by dropdown selections
-    if (dropdown1_value != None):
-        if (len(dropdown1_value) > 0):
-            final = final[final['sex_upon_outcome'].isin(dropdown1_value)]
+@cached_figure
+def subtype_counts(start_date, end_date, slider_value, dropdown1_value, dropdown2_value):
+    # counts per day, outcome type and subtype for a filter state, which both charts roll up
+    return get_backend().count(["Date", "outcome_type", "outcome_subtype"], start_date=start_date, end_date=end_date,
+        age_range=slider_value, sexes=dropdown1_value, breeds=dropdown2_value)
 
-    if (dropdown2_value != None):
-        if (len(dropdown2_value) > 0):
-            final = final[final['breed'].isin(dropdown2_value)]
+def rollup(counts, by):
+    return counts.groupby(by, as_index=False)['count'].sum()
 
+@cached_figure
+def sunburst_chart(start_date, end_date, slider_value, dropdown1_value, dropdown2_value, selection):
     # create new groupby data table with appropriate values for sunburst chart
-    final = final[(final['Date'] >= start_date) & (final['Date'] <= end_date)]
-    final = pd.DataFrame(final.groupby(["outcome_type", "outcome_subtype"], as_index=False)["count"].count())
+    counts = subtype_counts(start_date, end_date, slider_value, dropdown1_value, dropdown2_value)
+    counts = selected(counts, selection, ["Date", "Month_Year", "Year", "outcome_subtype"])
+    final = rollup(counts, ["outcome_type", "outcome_subtype"])
 
     fig = px.sunburst(final, path=['outcome_type', 'outcome_subtype'], values='count',
         color_discrete_sequence=px.colors.qualitative.Bold)
@@ -166,27 +193,48 @@ def update_sunburst(start_date, end_date, slider_value, dropdown1_value, dropdow
             Input("dropdown-sex", "value"),
             Input("dropdown-breed", "value"),
             Input("dropdown-outcome-subtypes", "value"),
-            Input("radio-items-subtypes", "value")])
-def update_bargraph(start_date, end_date, slider_value, dropdown1_value, dropdown2_value, outcome_value, radio_value):
-    # filter by slider selection
-    final = df[(df['outcome_age_(months)'] >= slider_value[0]) & (df['outcome_age_(months)'] <= slider_value[1])]
-
-    # filter by dropdown selections
-    if (dropdown1_value != None):
-        if (len(dropdown1_value) > 0):
-            final = final[final['sex_upon_outcome'].isin(dropdown1_value)]
-
-    if (dropdown2_value != None):
-        if (len(dropdown2_value) > 0):
-            final = final[final['breed'].isin(dropdown2_value)]
-
-    # create new groupby data table with appropriate values for sunburst chart
-    final = final[(final['Date'] >= start_date) & (final['Date'] <= end_date)]
-    final = pd.DataFrame(final.groupby([radio_value, "outcome_type", "outcome_subtype"], as_index=False)["count"].count())
-    final = final[final['outcome_type'] == outcome_value]
+            Input("radio-items-subtypes", "value"),
+            crossfilter.input()])
+def update_bargraph(start_date, end_date, slider_value, dropdown1_value, dropdown2_value, outcome_value, radio_value, selection):
+    skip_prerendered(defaults)
+    return bar_chart(start_date, end_date, slider_value, dropdown1_value, dropdown2_value, outcome_value, radio_value,
+        crossfilter.selection_for("bar-graph", selection))
+
+@cached_figure
+def bar_chart(start_date, end_date, slider_value, dropdown1_value, dropdown2_value, outcome_value, radio_value, selection):
+    # the outcome type's counts, rolled up from days to the selected period; a wedge clicked on the
+    # sunburst takes the place of the dropdown's outcome type
+    counts = subtype_counts(start_date, end_date, slider_value, dropdown1_value, dropdown2_value)
+    if selection and "outcome_type" in selection["values"]:
+        outcome_value = selection["values"]["outcome_type"]
+    counts = selected(counts[counts["outcome_type"] == outcome_value], selection, ["outcome_subtype"])
+    final = rollup(counts.assign(**{radio_value: period_values(counts["Date"], radio_value)}),
+        [radio_value, "outcome_type", "outcome_subtype"])
 
     fig = px.bar(final, x=radio_value, y="count", color="outcome_subtype", color_discrete_sequence=px.colors.qualitative.Safe)
     fig.update_layout({'plot_bgcolor': 'rgba(0, 0, 0, 0)', 'paper_bgcolor': 'rgba(0, 0, 0, 0)'})
     fig.update_xaxes(categoryorder='array', categoryarray=sorted_month_year)
 
     return fig
+
+# figures prefetched when another page changes the shared filters
+defaults = {
+    "date-picker-range.start_date": start_date,
+    "date-picker-range.end_date": end_date,
+    "range-slider.value": [store.min_age, 12],
+    "dropdown-sex.value": None,
+    "dropdown-breed.value": None,
+    "dropdown-outcome-subtypes.value": outcomes[1],
+    "radio-items-subtypes.value": "Month_Year",
+    "subtypes-selection.data": None
+}
+
+prefetch.register(__name__, sunburst_chart, ["date-picker-range.start_date", "date-picker-range.end_date",
+    "range-slider.value", "dropdown-sex.value", "dropdown-breed.value", "subtypes-selection.data"], defaults)
+prefetch.register(__name__, bar_chart, ["date-picker-range.start_date", "date-picker-range.end_date",
+    "range-slider.value", "dropdown-sex.value", "dropdown-breed.value", "dropdown-outcome-subtypes.value",
+    "radio-items-subtypes.value", "subtypes-selection.data"], defaults)
+
+# figures for the layout's values, so that a first visit needs no callback
+layout["sunburst-graph"].figure = render(sunburst_chart)
+layout["bar-graph"].figure = render(bar_chart)
@@ -6,6 +6,12 @@ import plotly.express as px
 import plotly.graph_objects as go
 import dash_bootstrap_components as dbc
 from dateutil.relativedelta import relativedelta
+from utils.data import get_store
+from utils.search import search_dropdown
+from utils.backends import get_backend
+from utils.cache import cached_figure
+from utils import prefetch
+from utils.prerender import render, skip_prerendered
 
 dash.register_page(
     __name__,
@@ -14,25 +20,16 @@ dash.register_page(
     name="Outcomes by Age"
 )
 
-DATAPATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "../data")
-
-# data transformation
-df = pd.read_csv(os.path.join(DATAPATH,"animal-shelter-data.csv"), index_col=False)
-df["outcome_age_(months)"] = round(df["outcome_age_(days)"]/30)
-df["raw_date"] = df["datetime"].str.split(' ').str[0]
-df["Date"] = pd.to_datetime(df.raw_date)
-df['Month'] = df['Date'].dt.month_name()
-df['Year'] = df['Date'].dt.strftime('%Y')
-df['Month_Year'] = df['Month']+'-'+df['Year'].astype(str)
+# partitioned data, shared by all pages
+store = get_store()
 
 # values for date pickers
-start_date = min(df["Date"])
+start_date = store.min_date
 end_date = pd.Timestamp(start_date.date() + relativedelta(months=+12))
 
 # values for dropdown menus
-sexes = df['sex_upon_outcome'].unique().tolist()
-breeds = df['breed'].unique().tolist()
-outcomes = df['outcome_type'].unique().tolist()
+sexes = store.values('sex_upon_outcome')
+outcomes = store.values('outcome_type')
 
 # fourth page content
 layout = html.Div([
@@ -45,9 +42,9 @@ layout = html.Div([
             dcc.DatePickerRange(
                 id="date-picker-range",
                 start_date = start_date,
-                min_date_allowed = min(df["Date"]),
+                min_date_allowed = store.min_date,
                 end_date = end_date,
-                max_date_allowed = max(df["Date"]),
+                max_date_allowed = store.max_date,
                 persistence=True, persistence_type="local"
             )
         ], width=3),
@@ -55,18 +52,17 @@ layout = html.Div([
             html.Label("Age on outcome (months)"),
             dcc.RangeSlider(
                 id="range-slider-age",
-                min=min(df['outcome_age_(months)']),
-                max=max(df['outcome_age_(months)']),
-                value=[min(df['outcome_age_(months)']), 150],
+                min=store.min_age,
+                max=store.max_age,
+                value=[store.min_age, 150],
                 tooltip={"placement": "bottom", "always_visible": True},
                 persistence=True, persistence_type="local"
             )
         ], width=5),
         dbc.Col([], width=1),
         dbc.Col([
-            dcc.Dropdown(
-                id="dropdown-breed",
-                options=breeds,
+            search_dropdown(
+                "dropdown-breed", "breed",
                 placeholder="Select breed",
                 multi=True,
                 persistence=True, persistence_type="local"
@@ -125,16 +121,23 @@ layout = html.Div([
             Input("dropdown-outcome-age", "value"),
             Input("input-bins", "value")])
 def update_graphs(start_date, end_date, slider_value, dropdown2_value, outcome_value, bins_value):
-    # filter by slider selection
-    strip = df[(df['outcome_age_(months)'] >= slider_value[0]) & (df['outcome_age_(months)'] <= slider_value[1])]
+    skip_prerendered(defaults)
+    figs = age_charts(start_date, end_date, slider_value, dropdown2_value, outcome_value, bins_value)
 
-    # filter by dropdown selection
-    if (dropdown2_value != None):
-        if (len(dropdown2_value) > 0):
-            strip = strip[strip['breed'].isin(dropdown2_value)]
+    # warm the other pages for the filters persisted by this one
+    prefetch.schedule(__name__, {
+        "date-picker-range.start_date": start_date,
+        "date-picker-range.end_date": end_date,
+        "range-slider-age.value": slider_value,
+        "dropdown-breed.value": dropdown2_value
+    })
 
-    # create new groupby data table with appropriate values for strip chart
-    strip = strip[(strip['Date'] >= start_date) & (strip['Date'] <= end_date)]
+    return figs
+
+@cached_figure
+def age_charts(start_date, end_date, slider_value, dropdown2_value, outcome_value, bins_value):
+    strip = get_backend().rows(['outcome_age_(months)', 'outcome_type', 'sex_upon_outcome', 'count'], start_date=start_date,
+        end_date=end_date, age_range=slider_value, breeds=dropdown2_value)
 
     stacked = strip
     # filter by slider selection
@@ -158,3 +161,19 @@ def update_graphs(start_date, end_date, slider_value, dropdown2_value, outcome_v
     fig1.update_layout({'plot_bgcolor': 'rgba(0, 0, 0, 0)', 'paper_bgcolor': 'rgba(0, 0, 0, 0)'})
 
     return fig1, fig2
+
+# figures prefetched when another page changes the shared filters
+defaults = {
+    "date-picker-range.start_date": start_date,
+    "date-picker-range.end_date": end_date,
+    "range-slider-age.value": [store.min_age, 150],
+    "dropdown-breed.value": None,
+    "dropdown-outcome-age.value": outcomes[1],
+    "input-bins.value": 12
+}
+
+prefetch.register(__name__, age_charts, ["date-picker-range.start_date", "date-picker-range.end_date",
+    "range-slider-age.value", "dropdown-breed.value", "dropdown-outcome-age.value", "input-bins.value"], defaults)
+
+# figures for the layout's values, so that a first visit needs no callback
+layout["strip-graph-age"].figure, layout["stacked-graph"].figure = render(age_charts)
@@ -1,12 +1,21 @@
 import os
 import dash
 import pandas as pd
-from dash import dcc, html, callback, Input, Output
+from dash import dcc, html, callback, Input, Output, State
+from dash.exceptions import PreventUpdate
 import plotly.express as px
 import plotly.graph_objects as go
 import dash_bootstrap_components as dbc
 from dash.dependencies import Input, Output
 from dateutil.relativedelta import relativedelta
+from utils.data import get_store
+from utils.search import search_dropdown
+from utils.backends import get_backend
+from utils.background import RowEstimator, background_graph, progress_outputs, running_outputs
+from utils.cache import cached_figure
+from utils.crossfilter import CrossFilter, selected
+from utils import prefetch
+from utils.prerender import render, skip_prerendered
 
 dash.register_page(
     __name__,
@@ -15,25 +24,35 @@ dash.register_page(
     name="Outcomes by Breed"
 )
 
-DATAPATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "../data")
-
-# data transformation
-df = pd.read_csv(os.path.join(DATAPATH,"animal-shelter-data.csv"), index_col=False)
-df["outcome_age_(months)"] = round(df["outcome_age_(days)"]/30)
-df["raw_date"] = df["datetime"].str.split(' ').str[0]
-df["Date"] = pd.to_datetime(df.raw_date)
-df['Month'] = df['Date'].dt.month_name()
-df['Year'] = df['Date'].dt.strftime('%Y')
-df['Month_Year'] = df['Month']+'-'+df['Year'].astype(str)
+# partitioned data, shared by all pages
+store = get_store()
 
 # values for date pickers
-start_date = min(df["Date"])
+start_date = store.min_date
 end_date = pd.Timestamp(start_date.date() + relativedelta(months=+12))
 
 # values for dropdown menus
-sexes = df['sex_upon_outcome'].unique().tolist()
-colours = df['color'].unique().tolist()
-outcomes = df['outcome_type'].unique().tolist()
+sexes = store.values('sex_upon_outcome')
+outcomes = store.values('outcome_type')
+
+# breeds outside the top-N by count are folded into a single "Other" bucket, and the scatter never draws
+# more markers than MAX_MARKERS, so the figure stays bounded as new breeds appear in the data
+TOP_BREEDS = int(os.environ.get("TOP_BREEDS", 25))
+MAX_MARKERS = int(os.environ.get("MAX_MARKERS", 500))
+OTHER = "Other"
+
+# row-count estimates deciding whether the scatter chart is computed inline or in the background
+estimator = RowEstimator(store)
+
+# clicking a bubble of either chart filters the other one to its outcome type and sex; the breeds of the
+# two charts never overlap
+crossfilter = CrossFilter("breed-selection", {"scatter-graph-breed": None, "scatter-graph-breed-tail": None}, [
+    Input("date-picker-range", "start_date"),
+    Input("date-picker-range", "end_date"),
+    Input("range-slider-age", "value"),
+    Input("dropdown-colour", "value"),
+    Input("cfa-switch", "value")])
+SELECTED_COLUMNS = ['outcome_type', 'sex_upon_outcome']
 
 # fifth page content
 layout = html.Div([
@@ -46,9 +65,9 @@ layout = html.Div([
             dcc.DatePickerRange(
                 id="date-picker-range",
                 start_date = start_date,
-                min_date_allowed = min(df["Date"]),
+                min_date_allowed = store.min_date,
                 end_date = end_date,
-                max_date_allowed = max(df["Date"]),
+                max_date_allowed = store.max_date,
                 persistence=True, persistence_type="local"
             )
         ], width=3),
@@ -56,9 +75,9 @@ layout = html.Div([
             html.Label("Age on outcome (months)"),
             dcc.RangeSlider(
                 id="range-slider-age",
-                min=min(df['outcome_age_(months)']),
-                max=max(df['outcome_age_(months)']),
-                value=[min(df['outcome_age_(months)']), 24],
+                min=store.min_age,
+                max=store.max_age,
+                value=[store.min_age, 24],
                 tooltip={"placement": "bottom", "always_visible": True},
                 persistence=True, persistence_type="local"
             )
@@ -73,9 +92,8 @@ layout = html.Div([
             )
         ], width=2),
         dbc.Col([
-            dcc.Dropdown(
-                id="dropdown-colour",
-                options=colours,
+            search_dropdown(
+                "dropdown-colour", "color",
                 placeholder="Select colour",
                 multi=True,
                 persistence=True, persistence_type="local"
@@ -87,12 +105,39 @@ layout = html.Div([
         target="date-picker-range"
     ),
 
+    # row for user-selections for scatter graph
+    dbc.Row([
+        dbc.Col([], width=9),
+        dbc.Col([
+            dbc.Input(id="input-top-breeds", type="number", min=1, max=200, step=1, value=TOP_BREEDS,
+            persistence=True, persistence_type="local")
+        ], width=1),
+        dbc.Col([
+            dbc.Button("Other breeds", id="button-other-breeds", color='secondary', n_clicks=0)
+        ], width=2)
+    ], style={'margin-top': '50px'}),
+    dbc.Tooltip(
+        "Number of breeds shown individually, " +
+        "the remaining breeds are grouped into 'Other'",
+        target="input-top-breeds"
+    ),
+    dbc.Tooltip(
+        "Show the breeds grouped into 'Other'",
+        target="button-other-breeds"
+    ),
+
     # row for graph
     dbc.Row([
         dbc.Col([
-            dbc.Spinner(children=[dcc.Graph(id='scatter-graph-breed')], color='secondary')
+            background_graph('scatter-graph-breed')
         ])
-    ])
+    ]),
+
+    # drill-down into the breeds of the "Other" bucket
+    dbc.Collapse([
+        dbc.Spinner(children=[dcc.Graph(id='scatter-graph-breed-tail')], color='secondary')
+    ], id="collapse-other-breeds", is_open=False),
+    crossfilter.component()
 ])
 
 # callback to update change colour of Switch component to gray
@@ -103,30 +148,154 @@ def update_switch(activated):
         return 'bg-secondary',
     return None
 
-@callback(Output("scatter-graph-breed", "figure"),
-            [Input("date-picker-range", "start_date"),
-            Input("date-picker-range", "end_date"),
-            Input("range-slider-age", "value"),
-            Input("dropdown-colour", "value"),
-            Input("cfa-switch", "value")])
-def update_scatter_chart(start_date, end_date, slider_value, dropdown2_value, switch_value):
-    # filter by slider selection
-    strip = df[(df['outcome_age_(months)'] >= slider_value[0]) & (df['outcome_age_(months)'] <= slider_value[1])]
+@cached_figure
+def breed_table(start_date, end_date, slider_value, dropdown2_value, switch_value):
+    # create new groupby data table with appropriate values for strip chart, which both charts and their
+    # selections slice
+    return get_backend().count(['breed', 'outcome_type', 'sex_upon_outcome'], start_date=start_date, end_date=end_date,
+        age_range=slider_value, colours=dropdown2_value, cfa=switch_value)
+
+def breed_counts(start_date, end_date, slider_value, dropdown2_value, switch_value, set_progress=None):
+    final = breed_table(start_date, end_date, slider_value, dropdown2_value, switch_value)
+
+    if set_progress:
+        set_progress((75, "Bucketing breeds"))
 
-    # filter by dropdown selection
-    if (dropdown2_value != None):
-        if (len(dropdown2_value) > 0):
-            strip = strip[strip['color'].isin(dropdown2_value)]
+    return final
 
-    # create new groupby data table with appropriate values for strip chart
-    strip = strip[(strip['Date'] >= start_date) & (strip['Date'] <= end_date)]
-    strip = strip[strip['cfa_breed'] == switch_value]
+def top_breeds(final, top_n):
+    # breeds ordered by their total count, largest first
+    totals = final.groupby('breed')['count'].sum().sort_values(ascending=False, kind='mergesort')
+    return totals.index[:top_n].tolist()
 
-    final = pd.DataFrame(strip.groupby(['breed', 'outcome_type', 'sex_upon_outcome'], as_index=False)['count'].count())
+def cap_markers(final):
+    # keep the largest bubbles when there are more combinations than markers allowed
+    if len(final) > MAX_MARKERS:
+        final = final.nlargest(MAX_MARKERS, 'count')
+    return final
 
+def breed_scatter(final, breed_order):
     fig = px.scatter(final, x="breed", y="outcome_type", size='count', color="sex_upon_outcome",
         color_discrete_sequence=px.colors.qualitative.Light24)
     fig.update_layout(autosize=False, width=1600, height=650)
     fig.update_layout({'plot_bgcolor': 'rgba(0, 0, 0, 0)', 'paper_bgcolor': 'rgba(0, 0, 0, 0)'})
+    fig.update_xaxes(categoryorder='array', categoryarray=breed_order)
+
+    return fig
+
+def scatter_chart(start_date, end_date, slider_value, dropdown2_value, switch_value, top_n, selection=None, set_progress=None):
+    final = breed_counts(start_date, end_date, slider_value, dropdown2_value, switch_value, set_progress)
+    top = top_breeds(final, top_n or TOP_BREEDS)
+    final = selected(final, selection, SELECTED_COLUMNS).copy()
+
+    # fold the long tail into the "Other" bucket with its aggregated count
+    final['breed'] = final['breed'].where(final['breed'].isin(top), OTHER)
+    final = pd.DataFrame(final.groupby(['breed', 'outcome_type', 'sex_upon_outcome'], as_index=False)['count'].sum())
+
+    return breed_scatter(cap_markers(final), top + [OTHER])
+
+@cached_figure
+def scatter_figure(start_date, end_date, slider_value, dropdown2_value, switch_value, top_n, selection):
+    return scatter_chart(start_date, end_date, slider_value, dropdown2_value, switch_value, top_n, selection)
+
+@cached_figure
+def tail_figure(start_date, end_date, slider_value, dropdown2_value, switch_value, top_n, selection):
+    final = breed_counts(start_date, end_date, slider_value, dropdown2_value, switch_value)
+    order = top_breeds(final, None)[top_n or TOP_BREEDS:]
+    final = selected(final[final['breed'].isin(order)], selection, SELECTED_COLUMNS)
+
+    return breed_scatter(cap_markers(final), order)
+
+# small queries are answered inline, large ones are handed over to the background callback below
+@callback([Output("scatter-graph-breed-inline", "data"),
+            Output("scatter-graph-breed-job", "data")],
+            [Input("date-picker-range", "start_date"),
+            Input("date-picker-range", "end_date"),
+            Input("range-slider-age", "value"),
+            Input("dropdown-colour", "value"),
+            Input("cfa-switch", "value"),
+            Input("input-top-breeds", "value"),
+            crossfilter.input()])
+def update_scatter_chart(start_date, end_date, slider_value, dropdown2_value, switch_value, top_n, selection):
+    skip_prerendered(defaults)
+    args = [start_date, end_date, slider_value, dropdown2_value, switch_value, top_n,
+        crossfilter.selection_for("scatter-graph-breed", selection)]
+    if not scatter_figure.is_cached(*args) and estimator.runs_in_background(start_date, end_date, slider_value):
+        return dash.no_update, args
+
+    fig = scatter_figure(*args)
+
+    # warm the other pages for the filters persisted by this one
+    prefetch.schedule(__name__, {
+        "date-picker-range.start_date": start_date,
+        "date-picker-range.end_date": end_date,
+        "range-slider-age.value": slider_value
+    })
+
+    return fig, dash.no_update
+
+@callback(Output("scatter-graph-breed-background", "data"),
+            Input("scatter-graph-breed-job", "data"),
+            background=True,
+            progress=progress_outputs('scatter-graph-breed'),
+            running=running_outputs('scatter-graph-breed'),
+            cancel=[Input("scatter-graph-breed-inline", "data"),
+                Input("date-picker-range", "start_date"),
+                Input("date-picker-range", "end_date"),
+                Input("range-slider-age", "value"),
+                Input("dropdown-colour", "value"),
+                Input("cfa-switch", "value"),
+                Input("input-top-breeds", "value"),
+                crossfilter.input()],
+            prevent_initial_call=True)
+def update_scatter_chart_background(set_progress, job):
+    set_progress((0, "Querying"))
+
+    fig = scatter_chart(*job, set_progress=set_progress)
+    scatter_figure.store(job, fig)
 
     return fig
+
+@callback(Output("collapse-other-breeds", "is_open"),
+            [Input("button-other-breeds", "n_clicks")],
+            [State("collapse-other-breeds", "is_open")],
+            prevent_initial_call=True)
+def toggle_other_breeds(n1, is_open):
+    if n1:
+        return not is_open
+    return is_open
+
+# the tail is only computed while the drill-down is open
+@callback(Output("scatter-graph-breed-tail", "figure"),
+            [Input("collapse-other-breeds", "is_open"),
+            Input("date-picker-range", "start_date"),
+            Input("date-picker-range", "end_date"),
+            Input("range-slider-age", "value"),
+            Input("dropdown-colour", "value"),
+            Input("cfa-switch", "value"),
+            Input("input-top-breeds", "value"),
+            crossfilter.input()])
+def update_tail_chart(is_open, start_date, end_date, slider_value, dropdown2_value, switch_value, top_n, selection):
+    if not is_open:
+        raise PreventUpdate
+
+    return tail_figure(start_date, end_date, slider_value, dropdown2_value, switch_value, top_n,
+        crossfilter.selection_for("scatter-graph-breed-tail", selection))
+
+# figures prefetched when another page changes the shared filters
+defaults = {
+    "date-picker-range.start_date": start_date,
+    "date-picker-range.end_date": end_date,
+    "range-slider-age.value": [store.min_age, 24],
+    "dropdown-colour.value": None,
+    "cfa-switch.value": True,
+    "input-top-breeds.value": TOP_BREEDS,
+    "breed-selection.data": None
+}
+
+prefetch.register(__name__, scatter_figure, ["date-picker-range.start_date", "date-picker-range.end_date",
+    "range-slider-age.value", "dropdown-colour.value", "cfa-switch.value", "input-top-breeds.value",
+    "breed-selection.data"], defaults)
+
+# figure for the layout's values, so that a first visit needs no callback
+layout["scatter-graph-breed"].figure = render(scatter_figure)
@@ -6,6 +6,16 @@ import plotly.express as px
 import plotly.graph_objects as go
 import dash_bootstrap_components as dbc
 from dateutil.relativedelta import relativedelta
+from utils.data import get_store, filter_data
+from utils.search import search_dropdown
+from utils.backends import get_backend
+from utils.background import RowEstimator, background_graph, progress_outputs, running_outputs
+from utils.cache import cached_figure
+from utils.sampling import StratifiedSample
+from utils.prefix import PrefixIndex
+from utils.crossfilter import CrossFilter, selected, selected_period
+from utils import prefetch
+from utils.prerender import render, skip_prerendered
 
 dash.register_page(
     __name__,
@@ -14,29 +24,20 @@ dash.register_page(
     name="Outcomes"
 )
 
-DATAPATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "../data")
-
-# data transformation
-df = pd.read_csv(os.path.join(DATAPATH,"animal-shelter-data.csv"), index_col=False)
-df["outcome_age_(months)"] = round(df["outcome_age_(days)"]/30)
-df["raw_date"] = df["datetime"].str.split(' ').str[0]
-df["Date"] = pd.to_datetime(df.raw_date)
-df['Month'] = df['Date'].dt.month_name()
-df['Year'] = df['Date'].dt.strftime('%Y')
-df['Month_Year'] = df['Month']+'-'+df['Year'].astype(str)
+# partitioned data, shared by all pages
+store = get_store()
 
 # values for date pickers
-start_date = min(df["Date"])
+start_date = store.min_date
 end_date = pd.Timestamp(start_date.date() + relativedelta(months=+36))
 
 # values for dropdown menus
-sexes = df['sex_upon_outcome'].unique().tolist()
-breeds = df['breed'].unique().tolist()
-outcomes = df['outcome_type'].unique().tolist()
+sexes = store.values('sex_upon_outcome')
+outcomes = store.values('outcome_type')
 
 # sorting of stacked bar chart x-axis
 months_order = ['January', 'February', 'March', 'April', 'May', 'June', 'July', 'August', 'September', 'October', 'November', 'December']
-years = df['Year'].unique().tolist()
+years = store.values('Year')
 years = sorted(years)
 
 sorted_month_year = list()
@@ -44,10 +45,35 @@ for i in range(len(years)):
     for j in range(len(months_order)):
         sorted_month_year.append(months_order[j] + '-' + str(years[i]))
 
+# row-count estimates deciding whether the area chart is computed inline or in the background
+estimator = RowEstimator(store)
+
+# cumulative counts over (day x age) per outcome type for the KPIs
+kpi_index = PrefixIndex(store)
+
+# stratified sample (by outcome type and year) answering the KPIs and area chart in approximate mode
+sample = StratifiedSample(store)
+
+# clicking the area chart shows the KPIs within the clicked period, until the filters or the period change
+crossfilter = CrossFilter("overview-selection", {"gross-outcomes": None}, [
+    Input("date-picker-range-overview", "start_date"),
+    Input("date-picker-range-overview", "end_date"),
+    Input("range-slider", "value"),
+    Input("dropdown-sex", "value"),
+    Input("dropdown-breed", "value"),
+    Input("radio-items-outcomes", "value")])
+
 # first page content
 layout = html.Div([
     html.H3("Overview of Outcomes", style={'display': 'inline'}),
     dbc.Button("KPIs", id="button-kpis", color='secondary', n_clicks=0, style={'display': 'inline', 'float': 'right'}),
+    dbc.Switch(
+        id="approx-switch",
+        label="Approximate",
+        value=False,
+        style={'display': 'inline-block', 'float': 'right', 'margin-right': '20px', 'margin-top': '5px'},
+        persistence=True, persistence_type="local"
+    ),
     dbc.Modal([
         dbc.ModalHeader("Set Key Performance Indices (KPIs)"),
         dbc.ModalBody([
@@ -84,9 +110,9 @@ layout = html.Div([
             dcc.DatePickerRange(
                 id="date-picker-range-overview",
                 start_date = start_date,
-                min_date_allowed = min(df["Date"]),
+                min_date_allowed = store.min_date,
                 end_date = end_date,
-                max_date_allowed = max(df["Date"]),
+                max_date_allowed = store.max_date,
                 persistence=True, persistence_type="local"
             )
         ], width=3),
@@ -94,9 +120,9 @@ layout = html.Div([
             html.Label("Age on outcome (months)"),
             dcc.RangeSlider(
                 id="range-slider",
-                min=min(df['outcome_age_(months)']),
-                max=max(df['outcome_age_(months)']),
-                value=[min(df['outcome_age_(months)']), 12],
+                min=store.min_age,
+                max=store.max_age,
+                value=[store.min_age, 12],
                 tooltip={"placement": "bottom", "always_visible": True},
                 persistence=True, persistence_type="local"
             )
@@ -112,9 +138,8 @@ layout = html.Div([
             )
         ], width=2),
         dbc.Col([
-            dcc.Dropdown(
-                id="dropdown-breed",
-                options=breeds,
+            search_dropdown(
+                "dropdown-breed", "breed",
                 placeholder="Select breed",
                 multi=True,
                 persistence=True, persistence_type="local"
@@ -129,6 +154,11 @@ layout = html.Div([
         "Set the KPIs to be displayed",
         target="button-kpis"
     ),
+    dbc.Tooltip(
+        "Estimate the KPIs and chart from a sample, " +
+        "with 95% confidence intervals on the KPIs",
+        target="approx-switch"
+    ),
 
     # row for KPIs
     dbc.Row([
@@ -180,14 +210,16 @@ layout = html.Div([
             )
         ], width=1),
         dbc.Col([
-            dbc.Spinner(children=[dcc.Graph(id='gross-outcomes')], color='secondary')
+            background_graph('gross-outcomes')
         ], width=11)
-    ], style={'margin-top': '40px'})
+    ], style={'margin-top': '40px'}),
+    crossfilter.component()
 ])
 
 @callback(Output("modal-kpis", "is_open"),
             [Input("button-kpis", "n_clicks")],
-            [State("modal-kpis", "is_open")])
+            [State("modal-kpis", "is_open")],
+            prevent_initial_call=True)
 def toggle_modal(n1, is_open):
     if n1:
         return not is_open
@@ -206,32 +238,30 @@ def toggle_modal(n1, is_open):
             Input("dropdown-kpi2", "value"),
             Input("dropdown-kpi3", "value"),
             Input("dropdown-sex", "value"),
-            Input("dropdown-breed", "value")])
-def update_adoptions_pie(start_date, end_date, slider_value, dropdown_kpi1, dropdown_kpi2, dropdown_kpi3, dropdown1_value, dropdown2_value):
-    # filter by slider selection
-    final = df[(df['outcome_age_(months)'] >= slider_value[0]) & (df['outcome_age_(months)'] <= slider_value[1])]
+            Input("dropdown-breed", "value"),
+            Input("approx-switch", "value"),
+            crossfilter.input()])
+def update_adoptions_pie(start_date, end_date, slider_value, dropdown_kpi1, dropdown_kpi2, dropdown_kpi3, dropdown1_value, dropdown2_value, approx_value, selection):
+    skip_prerendered(defaults)
+    return kpi_cards(start_date, end_date, slider_value, dropdown_kpi1, dropdown_kpi2, dropdown_kpi3, dropdown1_value, dropdown2_value, approx_value, selection)
 
-    # filter by dropdown selections
-    if (dropdown1_value != None):
-        if (len(dropdown1_value) > 0):
-            final = final[final['sex_upon_outcome'].isin(dropdown1_value)]
+@cached_figure
+def kpi_cards(start_date, end_date, slider_value, dropdown_kpi1, dropdown_kpi2, dropdown_kpi3, dropdown1_value, dropdown2_value, approx_value=False, selection=None):
+    if selection:
+        return period_kpi_cards(start_date, end_date, slider_value, dropdown_kpi1, dropdown_kpi2, dropdown_kpi3, dropdown1_value, dropdown2_value, approx_value, selection)
 
-    if (dropdown2_value != None):
-        if (len(dropdown2_value) > 0):
-            final = final[final['breed'].isin(dropdown2_value)]
+    if approx_value:
+        return approximate_kpi_cards(start_date, end_date, slider_value, dropdown_kpi1, dropdown_kpi2, dropdown_kpi3, dropdown1_value, dropdown2_value)
 
-    final = final[(final['Date'] >= start_date) & (final['Date'] <= end_date)]
-    final = pd.DataFrame(final.groupby(['outcome_type'], as_index=False)['count'].count())
-    total = sum(final['count'])
+    # per-outcome counts are a few lookups in the prefix sums, outcomes without rows are left out as a groupby would
+    counts = kpi_index.counts(start_date, end_date, slider_value, dropdown1_value, dropdown2_value)
+    counts = {outcome: count for outcome, count in counts.items() if count > 0}
+    total = sum(counts.values())
 
     try:
-        kpi1_df = final[final['outcome_type'] == dropdown_kpi1]
-        kpi2_df = final[final['outcome_type'] == dropdown_kpi2]
-        kpi3_df = final[final['outcome_type'] == dropdown_kpi3]
-
-        kpi1 = int(kpi1_df['count'])
-        kpi2 = int(kpi2_df['count'])
-        kpi3 = int(kpi3_df['count'])
+        kpi1 = counts[dropdown_kpi1]
+        kpi2 = counts[dropdown_kpi2]
+        kpi3 = counts[dropdown_kpi3]
 
         kpi1_percentage = round(kpi1 / total * 100, 2)
         kpi2_percentage = round(kpi2 / total * 100, 2)
@@ -244,32 +274,141 @@ def update_adoptions_pie(start_date, end_date, slider_value, dropdown_kpi1, drop
 
     return str(kpi1_percentage) + "%", str(kpi2_percentage) + "%", str(kpi3_percentage) + "%", dropdown_kpi1, dropdown_kpi2, dropdown_kpi3
 
-@callback(Output("gross-outcomes", "figure"),
+def approximate_kpi_cards(start_date, end_date, slider_value, dropdown_kpi1, dropdown_kpi2, dropdown_kpi3, dropdown1_value, dropdown2_value):
+    final = filter_sample(start_date, end_date, slider_value, dropdown1_value, dropdown2_value)
+    kpis = sample.proportions(final, [dropdown_kpi1, dropdown_kpi2, dropdown_kpi3])
+
+    # percentage with the half-width of its confidence interval
+    cards = [[str(round(p * 100, 2)) + "%", html.Small(" \u00b1" + str(round(error * 100, 2)), className="text-muted")] for p, error in kpis]
+
+    return cards[0], cards[1], cards[2], dropdown_kpi1, dropdown_kpi2, dropdown_kpi3
+
+def period_kpi_cards(start_date, end_date, slider_value, dropdown_kpi1, dropdown_kpi2, dropdown_kpi3, dropdown1_value, dropdown2_value, approx_value, selection):
+    # shares of the outcomes within the period clicked on the area chart, from the counts the chart was drawn from
+    period, value = selected_period(selection)
+    if approx_value:
+        counts = approximate_outcome_counts(start_date, end_date, slider_value, dropdown1_value, dropdown2_value, period)
+    else:
+        counts = outcome_counts(start_date, end_date, slider_value, dropdown1_value, dropdown2_value, period)
+    counts = selected(counts, selection, [period]).groupby("outcome_type")["count"].sum()
+    total = counts.sum()
+
+    cards = [str(round(counts.get(kpi, 0) / total * 100, 2) if total else 0) + "%" for kpi in [dropdown_kpi1, dropdown_kpi2, dropdown_kpi3]]
+
+    return cards[0], cards[1], cards[2], dropdown_kpi1 + ", " + value, dropdown_kpi2 + ", " + value, dropdown_kpi3 + ", " + value
+
+def filter_sample(start_date, end_date, slider_value, dropdown1_value, dropdown2_value):
+    # the page filters applied to the rows of the stratified sample
+    return filter_data(sample.frame, start_date, end_date, slider_value, dropdown1_value, dropdown2_value)
+
+@cached_figure
+def outcome_counts(start_date, end_date, slider_value, dropdown1_value, dropdown2_value, radio_value):
+    # create new groupby data table with appropriate values for area chart, kept for the KPIs of a clicked period
+    return get_backend().count([radio_value, "outcome_type"], start_date=start_date, end_date=end_date,
+        age_range=slider_value, sexes=dropdown1_value, breeds=dropdown2_value)
+
+def approximate_outcome_counts(start_date, end_date, slider_value, dropdown1_value, dropdown2_value, radio_value):
+    # estimated counts, each sampled row standing for "weight" rows of its stratum
+    final = filter_sample(start_date, end_date, slider_value, dropdown1_value, dropdown2_value)
+    final = pd.DataFrame(final.groupby([radio_value, "outcome_type"], as_index=False)["weight"].sum())
+    final["count"] = final["weight"].round()
+
+    return final
+
+def area_chart(final, radio_value):
+    fig = px.area(final, x=radio_value, y="count", color="outcome_type")
+    fig.update_layout({'plot_bgcolor': 'rgba(0, 0, 0, 0)', 'paper_bgcolor': 'rgba(0, 0, 0, 0)'})
+    fig.update_xaxes(categoryorder='array', categoryarray=sorted_month_year)
+
+    return fig
+
+@cached_figure
+def gross_outcomes_figure(start_date, end_date, slider_value, dropdown1_value, dropdown2_value, radio_value, approx_value=False):
+    if approx_value:
+        return area_chart(approximate_outcome_counts(start_date, end_date, slider_value, dropdown1_value, dropdown2_value, radio_value), radio_value)
+
+    return area_chart(outcome_counts(start_date, end_date, slider_value, dropdown1_value, dropdown2_value, radio_value), radio_value)
+
+# small queries are answered inline, large ones are handed over to the background callback below
+@callback([Output("gross-outcomes-inline", "data"),
+            Output("gross-outcomes-job", "data")],
             [Input("date-picker-range-overview", "start_date"),
             Input("date-picker-range-overview", "end_date"),
             Input("range-slider", "value"),
             Input("dropdown-sex", "value"),
             Input("dropdown-breed", "value"),
-            Input("radio-items-outcomes", "value")])
-def update_graph(start_date, end_date, slider_value, dropdown1_value, dropdown2_value, radio_value):
-    # filter by slider selection
-    final = df[(df['outcome_age_(months)'] >= slider_value[0]) & (df['outcome_age_(months)'] <= slider_value[1])]
+            Input("radio-items-outcomes", "value"),
+            Input("approx-switch", "value")])
+def update_graph(start_date, end_date, slider_value, dropdown1_value, dropdown2_value, radio_value, approx_value):
+    skip_prerendered(defaults)
+    args = [start_date, end_date, slider_value, dropdown1_value, dropdown2_value, radio_value, approx_value]
 
-    # filter by dropdown selections
-    if (dropdown1_value != None):
-        if (len(dropdown1_value) > 0):
-            final = final[final['sex_upon_outcome'].isin(dropdown1_value)]
+    # the approximate mode only scans the sample, so it always runs inline
+    if not approx_value and not gross_outcomes_figure.is_cached(*args) and estimator.runs_in_background(start_date, end_date, slider_value):
+        return dash.no_update, args
 
-    if (dropdown2_value != None):
-        if (len(dropdown2_value) > 0):
-            final = final[final['breed'].isin(dropdown2_value)]
+    fig = gross_outcomes_figure(*args)
 
-    # create new groupby data table with appropriate values for area chart
-    final = final[(final['Date'] >= start_date) & (final['Date'] <= end_date)]
-    final = pd.DataFrame(final.groupby([radio_value, "outcome_type"], as_index=False)["count"].count())
+    # warm the other pages for the filters persisted by this one
+    prefetch.schedule(__name__, {
+        "date-picker-range-overview.start_date": start_date,
+        "date-picker-range-overview.end_date": end_date,
+        "range-slider.value": slider_value,
+        "dropdown-sex.value": dropdown1_value,
+        "dropdown-breed.value": dropdown2_value
+    })
 
-    fig = px.area(final, x=radio_value, y="count", color="outcome_type")
-    fig.update_layout({'plot_bgcolor': 'rgba(0, 0, 0, 0)', 'paper_bgcolor': 'rgba(0, 0, 0, 0)'})
-    fig.update_xaxes(categoryorder='array', categoryarray=sorted_month_year)
+    return fig, dash.no_update
+
+@callback(Output("gross-outcomes-background", "data"),
+            Input("gross-outcomes-job", "data"),
+            background=True,
+            progress=progress_outputs('gross-outcomes'),
+            running=running_outputs('gross-outcomes'),
+            cancel=[Input("gross-outcomes-inline", "data"),
+                Input("date-picker-range-overview", "start_date"),
+                Input("date-picker-range-overview", "end_date"),
+                Input("range-slider", "value"),
+                Input("dropdown-sex", "value"),
+                Input("dropdown-breed", "value"),
+                Input("radio-items-outcomes", "value"),
+                Input("approx-switch", "value")],
+            prevent_initial_call=True)
+def update_graph_background(set_progress, job):
+    start_date, end_date, slider_value, dropdown1_value, dropdown2_value, radio_value, approx_value = job
+    set_progress((0, "Querying"))
+
+    final = outcome_counts(start_date, end_date, slider_value, dropdown1_value, dropdown2_value, radio_value)
+    set_progress((90, "Plotting"))
+
+    fig = area_chart(final, radio_value)
+    gross_outcomes_figure.store(job, fig)
 
     return fig
+
+# figures prefetched when another page changes the shared filters
+defaults = {
+    "date-picker-range-overview.start_date": start_date,
+    "date-picker-range-overview.end_date": end_date,
+    "range-slider.value": [store.min_age, 12],
+    "dropdown-sex.value": None,
+    "dropdown-breed.value": None,
+    "dropdown-kpi1.value": outcomes[1],
+    "dropdown-kpi2.value": outcomes[0],
+    "dropdown-kpi3.value": outcomes[2],
+    "radio-items-outcomes.value": "Month_Year",
+    "approx-switch.value": False,
+    "overview-selection.data": None
+}
+
+prefetch.register(__name__, kpi_cards, ["date-picker-range-overview.start_date", "date-picker-range-overview.end_date",
+    "range-slider.value", "dropdown-kpi1.value", "dropdown-kpi2.value", "dropdown-kpi3.value", "dropdown-sex.value",
+    "dropdown-breed.value", "approx-switch.value", "overview-selection.data"], defaults)
+prefetch.register(__name__, gross_outcomes_figure, ["date-picker-range-overview.start_date", "date-picker-range-overview.end_date",
+    "range-slider.value", "dropdown-sex.value", "dropdown-breed.value", "radio-items-outcomes.value",
+    "approx-switch.value"], defaults)
+
+# KPIs and figure for the layout's values, so that a first visit needs no callback
+(layout["kpi1"].children, layout["kpi2"].children, layout["kpi3"].children,
+    layout["kpi1-title"].children, layout["kpi2-title"].children, layout["kpi3-title"].children) = render(kpi_cards)
+layout["gross-outcomes"].figure = render(gross_outcomes_figure)
@@ -0,0 +1,18 @@
+import os
+import shutil
+import tempfile
+
+# the tests read synthetic data and their own cache, set before any test imports utils.data, and never
+# the dashboard's data directory
+path = tempfile.mkdtemp()
+os.environ["DATA_PATH"] = path
+os.environ["CACHE_PATH"] = os.path.join(path, "cache")
+os.environ["PREFETCH"] = "0"
+
+from benchmarks.synthetic import make_raw
+
+make_raw(30000, seed=0).to_csv(os.path.join(path, "animal-shelter-data.csv"), index=False)
+
+
+def pytest_unconfigure(config):
+    shutil.rmtree(path, ignore_errors=True)
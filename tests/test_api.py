@@ -0,0 +1,23 @@
+import flask
+import pytest
+from utils.api import api
+
+
+@pytest.fixture(scope="module")
+def client():
+    server = flask.Flask(__name__)
+    server.register_blueprint(api)
+    return server.test_client()
+
+
+@pytest.mark.parametrize("query", ["min_age=abc", "max_age=twelve", "min_age=", "cfa=maybe", "start_date=someday"])
+def test_invalid_filters_are_rejected(client, query):
+    assert client.get("/api/v1/outcomes?" + query).status_code == 400
+
+
+def test_age_filter(client):
+    everything = client.get("/api/v1/outcomes").get_json()
+    kittens = client.get("/api/v1/outcomes?min_age=0&max_age=12").get_json()
+
+    assert kittens and everything
+    assert kittens != everything
@@ -0,0 +1,32 @@
+import os
+import multiprocessing
+from utils import assets
+
+
+def build(path):
+    assets.build(path)
+    assets.manifest.cache_clear()
+    return assets.manifest(path)
+
+
+def test_concurrent_builds(tmp_path):
+    # gunicorn workers building the assets together all end up with the same complete build
+    path = str(tmp_path / "cache" / "assets")
+
+    with multiprocessing.get_context("fork").Pool(4) as pool:
+        manifests = pool.map(build, [path] * 4)
+
+    assert all(m == manifests[0] for m in manifests)
+    assert set(manifests[0]) == set(assets.sources())
+    for name in manifests[0].values():
+        assert os.path.exists(os.path.join(path, name))
+
+
+def test_images_are_resized(tmp_path):
+    path = str(tmp_path / "assets")
+    files = build(path)
+
+    for name in assets.DISPLAY_HEIGHTS:
+        if name in files:
+            original = os.path.getsize(os.path.join(assets.ASSETSPATH, name))
+            assert os.path.getsize(os.path.join(path, files[name])) <= original
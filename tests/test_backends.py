@@ -0,0 +1,85 @@
+import glob
+import multiprocessing
+import pandas as pd
+import pytest
+from utils.backends import PandasBackend, SQLiteBackend, DuckDBBackend, ShardedBackend
+from utils.data import PARTITIONPATH, get_store
+from benchmarks.backends import GROUPINGS
+
+QUERY = (["Year", "outcome_type"], {'age_range': [0, 12]})
+
+backend = None
+
+
+def count(by, filters):
+    return backend.count(by, **filters)
+
+
+@pytest.fixture(scope="module")
+def sharded():
+    global backend
+    backend = ShardedBackend(get_store(), shards=2)
+    yield backend
+    backend.close()
+
+
+def test_sharded_counts_match_pandas(sharded):
+    by, filters = QUERY
+    pd.testing.assert_frame_equal(sharded.count(by, **filters), PandasBackend(get_store()).count(by, **filters))
+
+
+def test_sharded_backend_in_forked_children(sharded):
+    # a background callback is a forked process and a precompute worker a forked pool's daemon; neither
+    # can reach the parent's shards
+    by, filters = QUERY
+    expected = sharded.count(by, **filters)
+    context = multiprocessing.get_context("fork")
+
+    with context.Pool(1) as pool:
+        pd.testing.assert_frame_equal(pool.apply_async(count, QUERY).get(timeout=120), expected)
+
+    process = context.Process(target=count, args=QUERY)
+    process.start()
+    process.join(120)
+    assert process.exitcode == 0
+
+
+def test_sql_backends_match_pandas(tmp_path):
+    store = get_store()
+    backends = {'sqlite': SQLiteBackend(store, str(tmp_path / "shelter.sqlite"))}
+    try:
+        backends['duckdb'] = DuckDBBackend(PARTITIONPATH)
+    except ImportError:
+        pass
+
+    pandas = PandasBackend(store)
+    filters = [{}, {'start_date': "2014-03-01", 'end_date': "2016-06-30", 'age_range': [0, 24]},
+        {'sexes': store.values('sex_upon_outcome')[:2], 'breeds': store.values('breed')[:5], 'cfa': True}]
+    for by in GROUPINGS:
+        for f in filters:
+            expected = pandas.count(by, **f)
+            for name, backend in backends.items():
+                pd.testing.assert_frame_equal(backend.count(by, **f), expected, obj="{} {} {}".format(name, by, f))
+
+
+def build_sqlite(path):
+    return len(SQLiteBackend(get_store(), path).count(["outcome_type"]))
+
+
+def test_concurrent_sqlite_builds(tmp_path, monkeypatch):
+    # workers starting together: one builds the file, the others wait for it and find it current
+    path, builds = str(tmp_path / "shelter.sqlite"), tmp_path / "builds"
+    build = SQLiteBackend.build
+
+    def counted(self, store):
+        with open(builds, "a") as f:
+            f.write("build\n")
+        build(self, store)
+
+    monkeypatch.setattr(SQLiteBackend, "build", counted)
+    with multiprocessing.get_context("fork").Pool(4) as pool:
+        outcomes = pool.map(build_sqlite, [path] * 4)
+
+    assert len(set(outcomes)) == 1
+    assert builds.read_text().count("build") == 1
+    assert glob.glob(path + ".tmp-*") == []
@@ -0,0 +1,46 @@
+import pytest
+from cachelib import SimpleCache
+from utils import cache
+
+
+class Store:
+    def __init__(self, mtime):
+        self.metadata = {'source': {'path': "/data/animal-shelter-data.csv", 'mtime': mtime, 'size': 1000}, 'by': "Year"}
+
+
+@pytest.fixture
+def data(monkeypatch):
+    # the store the keys are derived from, replaced as a csv refresh would
+    state = {'store': Store(1.0)}
+    monkeypatch.setattr(cache, "get_store", lambda: state['store'])
+    monkeypatch.setattr(cache, "figure_cache", SimpleCache())
+    cache.data_version.cache_clear()
+    yield state
+    cache.data_version.cache_clear()
+
+
+def test_refreshed_data_is_not_read_from_the_cache(data):
+    # a figure and the aggregate it is built from, as the pages and their prerendered layouts use them
+    rows = {'count': 10}
+
+    @cache.cached_figure
+    def aggregate(start_date):
+        return rows['count']
+
+    @cache.cached_figure
+    def figure(start_date):
+        return {'total': aggregate(start_date)}
+
+    assert figure("2014-01-01") == {'total': 10}
+
+    rows['count'] = 20
+    assert figure("2014-01-01") == {'total': 10}
+
+    data['store'] = Store(2.0)
+    cache.data_version.cache_clear()
+    assert figure("2014-01-01") == {'total': 20}
+
+
+def test_keys_normalize_arguments(data):
+    assert cache.make_key("f", ["2014-01-01T00:00:00", []]) == cache.make_key("f", ["2014-01-01", None])
+    assert cache.make_key("f", [1.0]) == cache.make_key("f", [1])
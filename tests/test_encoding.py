@@ -0,0 +1,33 @@
+import datetime
+import decimal
+import numpy as np
+import pandas as pd
+import pytest
+import plotly.express as px
+from dash import dcc, html
+from dash._utils import to_json
+
+pytest.importorskip("orjson")
+
+from utils.encoding import fast_to_json
+
+
+def figure():
+    df = pd.DataFrame({'Date': pd.date_range("2015-01-01", periods=4), 'count': [0.1, 1e-05, 1e16, np.nan],
+        'breed': ["Domestic Shorthair Mix", "Chihuahua Shorthair Mix", "Bóxer", "☃"]})
+    return px.line(df, x='Date', y='count', color='breed')
+
+
+@pytest.mark.parametrize("value", [
+    {'multi': True, 'response': {'bar-graph': {'figure': figure()}}},
+    html.Div([dcc.Graph(figure=figure()), html.P("Perro mestizo"), html.Br()]),
+    {'float32': np.float32(0.1), 'float32s': np.array([0.1], dtype=np.float32), 'int': np.int64(3), 'bool': np.bool_(True),
+        'day': np.datetime64("2015-01-01"), 'timestamp': pd.Timestamp("2015-01-02 03:04"), 'missing': pd.NaT,
+        'decimal': decimal.Decimal("1.5"), 'objects': np.array(["x", 1], dtype=object), 1: "key"},
+    {'dates': np.array(["2015-01-01T10:00"], dtype='datetime64[ns]'), 'values': [1, 2.5, "é"]},
+    {'series': pd.Series([1.0, 2.0]), 'component': html.Br()},
+    [datetime.date(2015, 1, 1), datetime.datetime(2015, 1, 1, 2), (1, 2)],
+    1e-05
+])
+def test_same_bytes_as_dash(value):
+    assert fast_to_json(value) == to_json(value)
@@ -0,0 +1,9 @@
+import pytest
+from benchmarks import memory
+
+
+@pytest.mark.slow
+def test_memory_budgets():
+    # the import, callback and filter measurements of benchmarks/memory.py on 100k synthetic rows, each
+    # within its budget
+    assert memory.run(100000) == 0
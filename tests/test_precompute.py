@@ -0,0 +1,11 @@
+from utils.data import get_store
+from utils.precompute import default_grid
+
+
+def test_age_ranges_do_not_overlap():
+    # both ends are included and ages are whole months, so each age falls in exactly one range
+    store = get_store()
+    ages = range(int(store.min_age), int(store.max_age) + 1)
+    ranges = default_grid()['age']
+
+    assert all(sum(low <= age <= high for low, high in ranges) == 1 for age in ages)
@@ -0,0 +1,89 @@
+import time
+import collections
+import multiprocessing
+import pytest
+from cachelib import FileSystemCache
+from utils import cache, prefetch
+
+
+class Figure:
+    # a cached_figure that records the arguments it is computed with
+
+    def __init__(self, name):
+        self.__name__ = name
+        self.computed = list()
+
+    def is_cached(self, *args):
+        return False
+
+    def uncached(self, *args):
+        self.computed.append(args)
+
+    def store(self, args, value, prefetched=False):
+        pass
+
+
+@pytest.fixture
+def figures(monkeypatch):
+    figures = [Figure("histograms"), Figure("age_charts")]
+    monkeypatch.setattr(prefetch, "ENABLED", True)
+    monkeypatch.setattr(prefetch, "IDLE_DELAY", 0.01)
+    monkeypatch.setattr(prefetch, "latest", collections.OrderedDict())
+    monkeypatch.setattr(prefetch, "registry", [
+        {'page': "pages.distributions", 'func': figures[0], 'inputs': ["range-slider.value"], 'defaults': {'range-slider.value': [0, 12]}},
+        {'page': "pages.outcomes_by_age", 'func': figures[1], 'inputs': ["range-slider.value"], 'defaults': {'range-slider.value': [0, 12]}}
+    ])
+    monkeypatch.setitem(prefetch.state, 'in_flight', 1)
+    return figures
+
+
+def test_only_the_latest_state_is_prefetched(figures):
+    # a slider dragged over many values while requests are in flight
+    for high in range(13, 63):
+        prefetch.schedule("pages.outcomes_overview", {"range-slider.value": [0, high]})
+    prefetch.state['in_flight'] = 0
+
+    deadline = time.time() + 10
+    while (prefetch.latest or not all(f.computed for f in figures)) and time.time() < deadline:
+        time.sleep(0.01)
+    time.sleep(0.1)
+
+    assert [f.computed for f in figures] == [[([0, 62],)], [([0, 62],)]]
+
+
+def test_stats_cover_every_worker(monkeypatch, tmp_path):
+    monkeypatch.setattr(cache, "figure_cache", FileSystemCache(str(tmp_path)))
+
+    @cache.cached_figure
+    def histograms(slider_value):
+        return {'data': slider_value}
+
+    def prefetch_in_worker():
+        histograms.store(([0, 12],), histograms.uncached([0, 12]), prefetched=True)
+        cache.count('prefetched')
+
+    before = prefetch.report()
+
+    # a figure prefetched by another worker, a forked process as gunicorn's are, and read by this one
+    worker = multiprocessing.get_context("fork").Process(target=prefetch_in_worker)
+    worker.start()
+    worker.join(30)
+    assert worker.exitcode == 0
+    assert histograms([0, 12]) == {'data': [0, 12]}
+
+    after = prefetch.report()
+    assert after['prefetched'] - before['prefetched'] == 1
+    assert after['prefetch_hits'] - before['prefetch_hits'] == 1
+
+
+def test_idle_time_is_counted_between_requests(monkeypatch):
+    monkeypatch.setattr(prefetch, "ENABLED", True)
+    before = prefetch.report()['idle_seconds']
+
+    prefetch.request_started()
+    prefetch.request_finished()
+    time.sleep(0.2)
+    prefetch.request_started()
+    prefetch.request_finished()
+
+    assert prefetch.report()['idle_seconds'] - before >= 0.2
@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+from utils import prefix
+from utils.prefix import PrefixIndex
+from utils.data import get_store, load_range, filter_data
+from benchmarks.kpi_index import random_query
+
+
+@pytest.fixture(scope="module")
+def index():
+    return PrefixIndex(get_store())
+
+
+def filtered_counts(start_date, end_date, age_range, sexes, breeds):
+    final = filter_data(load_range(start_date, end_date), start_date, end_date, age_range, sexes, breeds)
+    return final.groupby('outcome_type')['count'].count().to_dict()
+
+
+def test_counts_match_filter_data(index):
+    df = load_range()
+    rng = np.random.default_rng(0)
+
+    for _ in range(60):
+        query = random_query(rng, df)
+        counts = index.counts(*query)
+        assert {k: v for k, v in counts.items() if v} == filtered_counts(*query), query
+
+
+def test_several_sexes_and_breeds(index):
+    store = get_store()
+    sexes, breeds = store.values('sex_upon_outcome')[:2], store.values('breed')[:6]
+    query = (str(store.min_date.date()), str(store.max_date.date()), [0, 60])
+
+    for filters in [(sexes, None), (None, breeds[:2]), (None, breeds), (sexes, breeds)]:
+        counts = index.counts(*query, *filters)
+        assert {k: v for k, v in counts.items() if v} == filtered_counts(*query, *filters), filters
+
+
+def test_variants_bounded_by_memory(index, monkeypatch):
+    monkeypatch.setattr(prefix, "MAX_VARIANTS_MB", 2.5 * index.base.nbytes / 2 ** 20)
+    store = get_store()
+    query = (str(store.min_date.date()), str(store.max_date.date()), [0, 60])
+
+    for breed in store.values('breed')[:5]:
+        index.counts(*query, None, [breed])
+
+    assert len(index.variants) == 2
+    assert index.variants_bytes() <= prefix.MAX_VARIANTS_MB * 2 ** 20
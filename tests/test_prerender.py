@@ -0,0 +1,24 @@
+import json
+import pytest
+
+
+@pytest.fixture(scope="module")
+def app():
+    import app
+    return app
+
+
+def test_index_leaves_out_prerendered_figures(app):
+    client = app.server.test_client()
+    index = client.get("/outcomes-by-breed").get_data(as_text=True)
+    config = json.loads(index.split('<script id="_dash-config" type="application/json">')[1].split("</script>")[0])
+
+    # the pages' layouts, without their figures, and still every id the callbacks use
+    layout = json.dumps(config['validation_layout'])
+    assert '"figure"' not in layout
+
+    ids = set()
+    for dependency in json.loads(client.get("/_dash-dependencies").data):
+        ids.update(output.rsplit(".", 1)[0] for output in dependency['output'].strip(".").split("..."))
+        ids.update(item['id'] for item in dependency['inputs'] + dependency['state'])
+    assert [i for i in ids if isinstance(i, str) and '"{}"'.format(i) not in layout] == []
@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+from utils.sampling import StratifiedSample
+from utils.store import FrameStore
+from utils.planner import FilterSpec, ColumnStats, plan
+from benchmarks.synthetic import make_data
+from benchmarks.kpi_index import random_query
+
+OUTCOMES = ['Adoption', 'Transfer', 'Euthanasia', 'Died']
+
+
+@pytest.fixture(scope="module")
+def data():
+    df = make_data(100000, seed=0)
+    store = FrameStore(df)
+    return df, ColumnStats(store), StratifiedSample(store)
+
+
+def test_intervals_cover_exact_shares(data):
+    # the 95% intervals of the approximate KPIs hold the exact shares for about 95% of random filters
+    df, stats, sample = data
+    rng = np.random.default_rng(1)
+
+    covered = total = 0
+    for _ in range(100):
+        spec = FilterSpec(*random_query(rng, df))
+        exact = plan(spec, stats).execute(df)['outcome_type'].value_counts()
+        if exact.sum() == 0:
+            continue
+
+        estimates = sample.proportions(plan(spec, stats).execute(sample.frame), OUTCOMES)
+        for outcome, (p, half_width) in zip(OUTCOMES, estimates):
+            covered += abs(p - exact.get(outcome, 0) / exact.sum()) <= half_width + 1e-12
+            total += 1
+
+    assert covered / total >= 0.93
+
+
+def test_no_filter_is_close(data):
+    df, stats, sample = data
+    exact = df['outcome_type'].value_counts(normalize=True)
+
+    for outcome, (p, half_width) in zip(OUTCOMES, sample.proportions(sample.frame, OUTCOMES)):
+        assert 0 < half_width < 0.02
+        assert abs(p - exact[outcome]) <= half_width
+
+
+def test_no_matching_rows():
+    df = make_data(2000, seed=0)
+    sample = StratifiedSample(FrameStore(df))
+
+    assert sample.proportions(sample.frame.iloc[:0], OUTCOMES) == [(0, 1.0)] * len(OUTCOMES)
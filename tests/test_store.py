@@ -0,0 +1,68 @@
+import os
+import json
+import glob
+import threading
+import multiprocessing
+from utils.data import prepare
+from utils.store import PartitionStore, build_partitions, is_current
+from benchmarks.synthetic import make_raw
+
+
+def build(csv, path):
+    build_partitions(csv, path, prepare)
+    return PartitionStore(path).rows
+
+
+def test_concurrent_builds(tmp_path):
+    # workers starting together: one builds, the others wait for it and find it current
+    csv, path = str(tmp_path / "outcomes.csv"), str(tmp_path / "partitions")
+    make_raw(20000, seed=0).to_csv(csv, index=False)
+
+    with multiprocessing.get_context("fork").Pool(4) as pool:
+        rows = pool.starmap(build, [(csv, path)] * 4)
+
+    assert rows == [20000] * 4
+    assert is_current(path, csv)
+    assert len(glob.glob(path + ".build-*")) == 1
+
+
+def test_rebuild_swaps_in_place(tmp_path):
+    # a reader never finds the partitions missing or half written while the csv is rebuilt
+    csv, path = str(tmp_path / "outcomes.csv"), str(tmp_path / "partitions")
+    make_raw(5000, seed=0).to_csv(csv, index=False)
+    build_partitions(csv, path, prepare)
+
+    errors, done = list(), threading.Event()
+
+    def read():
+        while not done.is_set():
+            try:
+                with open(os.path.join(path, "metadata.json")) as f:
+                    metadata = json.load(f)
+                for part in metadata['partitions']:
+                    assert os.path.exists(os.path.join(path, part['file']))
+            except Exception as e:
+                errors.append(e)
+
+    reader = threading.Thread(target=read)
+    reader.start()
+    for seed in range(1, 4):
+        make_raw(5000 + seed, seed=seed).to_csv(csv, index=False)
+        build_partitions(csv, path, prepare)
+    done.set()
+    reader.join()
+
+    assert errors == []
+    assert PartitionStore(path).rows == 5003
+    assert len(glob.glob(path + ".build-*")) == 1
+
+
+def test_replaces_a_directory_of_an_older_version(tmp_path):
+    csv, path = str(tmp_path / "outcomes.csv"), str(tmp_path / "partitions")
+    make_raw(1000, seed=0).to_csv(csv, index=False)
+    os.makedirs(path)
+
+    build_partitions(csv, path, prepare)
+
+    assert os.path.islink(path)
+    assert PartitionStore(path).rows == 1000
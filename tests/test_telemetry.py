@@ -0,0 +1,44 @@
+import multiprocessing
+import diskcache
+import flask
+import pytest
+from utils import telemetry
+
+
+@pytest.fixture
+def client(monkeypatch, tmp_path):
+    monkeypatch.setattr(telemetry, "ENABLED", True)
+    monkeypatch.setattr(telemetry, "graphs", diskcache.Cache(str(tmp_path / "telemetry")))
+
+    server = flask.Flask(__name__)
+    telemetry.init_app(server)
+    return server.test_client()
+
+
+def measurement(render_ms):
+    return {'page': "/outcomes-overview", 'graph': "line-graph", 'render_ms': render_ms, 'bytes': 2048}
+
+
+def send(client, render_ms):
+    return client.post("/_telemetry", json={'measurements': [measurement(render_ms)]}).status_code
+
+
+def test_malformed_batches_are_rejected(client):
+    assert client.post("/_telemetry", json=[measurement(10)]).status_code == 400
+    assert client.post("/_telemetry", data="not json").status_code == 400
+    assert client.post("/_telemetry", json={'measurements': "all"}).status_code == 400
+    assert client.post("/_telemetry", json={'measurements': [{'page': "/"}, measurement(-1)]}).status_code == 204
+    assert client.get("/_telemetry-stats").get_json() == []
+
+
+def test_stats_cover_every_worker(client):
+    # the other worker is a forked process, as gunicorn's are
+    context = multiprocessing.get_context("fork")
+    worker = context.Process(target=send, args=(client, 30))
+    worker.start()
+    worker.join(30)
+    assert worker.exitcode == 0
+
+    assert send(client, 10) == 204
+    stats = client.get("/_telemetry-stats").get_json()
+    assert [(row['graph'], row['count'], row['mean_ms'], row['mean_kb']) for row in stats] == [("line-graph", 2, 20.0, 2.0)]
@@ -0,0 +1,157 @@
+import io
+import os
+import pandas as pd
+import pyarrow as pa
+from flask import Blueprint, Response, request, abort
+from utils.cache import cached_figure
+from utils.data import PERIODS
+from utils.backends import get_backend
+
+# REST export of the aggregates shown on the dashboard, under /api/v1/<aggregate>
+api = Blueprint("api", __name__, url_prefix="/api/v1")
+
+# rows per chunk of a streamed response
+CHUNK_ROWS = int(os.environ.get("EXPORT_CHUNK_ROWS", 5000))
+
+MIMETYPES = {
+    'json': "application/json",
+    'csv': "text/csv",
+    'arrow': "application/vnd.apache.arrow.stream"
+}
+
+
+def filters_from_request(args):
+    # same filters as the pages, e.g. ?start_date=2014-01-01&min_age=0&max_age=12&sex=Spayed Female&cfa=true
+    try:
+        min_age = args.get('min_age')
+        max_age = args.get('max_age')
+        age_range = None
+        if min_age is not None or max_age is not None:
+            age_range = [float(min_age) if min_age is not None else float('-inf'), float(max_age) if max_age is not None else float('inf')]
+
+        cfa = args.get('cfa')
+        if cfa is not None:
+            cfa = {'true': True, '1': True, 'false': False, '0': False}[cfa.lower()]
+
+        start_date = args.get('start_date')
+        end_date = args.get('end_date')
+
+        return [
+            str(pd.Timestamp(start_date).date()) if start_date else None,
+            str(pd.Timestamp(end_date).date()) if end_date else None,
+            age_range,
+            args.getlist('sex'),
+            args.getlist('breed'),
+            args.getlist('colour'),
+            cfa,
+            args.getlist('outcome')
+        ]
+    except (KeyError, ValueError):
+        abort(400, "Invalid filter parameters")
+
+
+def keywords(filters):
+    return dict(zip(['start_date', 'end_date', 'age_range', 'sexes', 'breeds', 'colours', 'cfa', 'outcomes'], filters))
+
+
+def count_by(filters, columns):
+    return get_backend().count(columns, **keywords(filters))
+
+
+@cached_figure
+def outcome_counts(*filters):
+    return count_by(filters, ['outcome_type'])
+
+
+@cached_figure
+def subtype_counts(*filters):
+    return count_by(filters, ['outcome_type', 'outcome_subtype'])
+
+
+@cached_figure
+def period_series(period, *filters):
+    return count_by(filters, [period, 'outcome_type'])
+
+
+@cached_figure
+def breed_matrix(*filters):
+    return count_by(filters, ['breed', 'outcome_type', 'sex_upon_outcome'])
+
+
+@cached_figure
+def age_group_percentages(bins, *filters):
+    final = get_backend().rows(['outcome_age_(months)', 'sex_upon_outcome', 'outcome_type', 'count'], **keywords(filters))
+
+    # same binning as the stacked bar chart of the outcomes by age page
+    age_groups = pd.cut(final['outcome_age_(months)'], bins=bins, right=False).astype(str)
+    final = final.assign(**{'age_group_(months)': age_groups.str.replace('[', '', regex=False).str.replace(')', '', regex=False).str.replace(', ', '-', regex=False)})
+    final = pd.DataFrame(final.groupby(['sex_upon_outcome', 'outcome_type', 'age_group_(months)'], as_index=False)['count'].count())
+    final['percentage'] = 100 * final['count'] / final.groupby(['outcome_type', 'age_group_(months)'])['count'].transform('sum')
+
+    return final
+
+
+def aggregate(name, args, filters):
+    if name == 'outcomes':
+        return outcome_counts(*filters)
+    if name == 'subtypes':
+        return subtype_counts(*filters)
+    if name == 'series':
+        period = args.get('period', 'Month_Year')
+        if period not in PERIODS:
+            abort(400, "period must be one of " + ", ".join(PERIODS))
+        return period_series(period, *filters)
+    if name == 'breeds':
+        return breed_matrix(*filters)
+    if name == 'age-groups':
+        bins = args.get('bins', 12, type=int)
+        if not 1 <= bins <= 100:
+            abort(400, "bins must be between 1 and 100")
+        return age_group_percentages(bins, *filters)
+    abort(404)
+
+
+def stream_json(final):
+    yield '['
+    for i in range(0, len(final), CHUNK_ROWS):
+        chunk = final.iloc[i:i + CHUNK_ROWS].to_json(orient='records', date_format='iso')[1:-1]
+        yield (',' if i else '') + chunk
+    yield ']'
+
+
+def stream_csv(final):
+    yield final.iloc[:0].to_csv(index=False)
+    for i in range(0, len(final), CHUNK_ROWS):
+        yield final.iloc[i:i + CHUNK_ROWS].to_csv(index=False, header=False)
+
+
+def stream_arrow(final):
+    table = pa.Table.from_pandas(final, preserve_index=False)
+    sink = io.BytesIO()
+    writer = pa.ipc.new_stream(sink, table.schema)
+
+    # every record batch is sent as soon as it is written
+    for batch in table.to_batches(max_chunksize=CHUNK_ROWS):
+        writer.write_batch(batch)
+        yield sink.getvalue()
+        sink.seek(0)
+        sink.truncate()
+
+    writer.close()
+    yield sink.getvalue()
+
+
+STREAMS = {'json': stream_json, 'csv': stream_csv, 'arrow': stream_arrow}
+
+
+@api.route("/<name>")
+def export(name):
+    fmt = request.args.get('format') or request.accept_mimetypes.best_match(
+        [MIMETYPES[f] for f in MIMETYPES], default=MIMETYPES['json'])
+    fmt = {v: k for k, v in MIMETYPES.items()}.get(fmt, fmt)
+    if fmt not in STREAMS:
+        abort(406, "format must be one of " + ", ".join(STREAMS))
+
+    final = aggregate(name, request.args, filters_from_request(request.args))
+
+    return Response(STREAMS[fmt](final), mimetype=MIMETYPES[fmt])
@@ -0,0 +1,185 @@
+import io
+import os
+import re
+import sys
+import gzip
+import json
+import hashlib
+import mimetypes
+import functools
+import brotli
+from flask import Blueprint, Response, request, abort
+from utils.cache import CACHEPATH
+from utils.store import build_lock, new_build, swap_in
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ASSETSPATH = os.path.join(ROOT, "assets")
+BUILDPATH = os.path.join(CACHEPATH, "assets")
+
+# fingerprinted assets are served from here with immutable cache headers
+URL_PREFIX = "/static-assets"
+
+# height in px each image is shown at; images are resized to twice that for high density screens
+DISPLAY_HEIGHTS = {
+    'austin-animal-center-logo-wide.jpeg': 110,
+    'facebook-icon.png': 27,
+    'insta-icon.png': 27,
+    'twitter-icon.png': 25,
+    'linkedin-icon.png': 23,
+    'youtube-icon.png': 25,
+    'plotly-dash-icon.png': 30
+}
+
+# text assets that get brotli and gzip variants next to them
+COMPRESSIBLE = ('.json', '.css', '.js', '.svg')
+
+# bump when the output of the build changes, so that existing builds are redone
+VERSION = 1
+
+assets = Blueprint("built_assets", __name__, url_prefix=URL_PREFIX)
+
+
+def sources():
+    # files the app, its pages and utils refer to, and the stylesheets dash would include on every page
+    code = ""
+    for folder in [ROOT, os.path.join(ROOT, "pages"), os.path.join(ROOT, "utils")]:
+        for file in sorted(os.listdir(folder)):
+            if file.endswith(".py"):
+                with open(os.path.join(folder, file), encoding="utf-8") as f:
+                    code += f.read()
+
+    return [name for name in sorted(os.listdir(ASSETSPATH)) if name.endswith('.css') or name in code]
+
+
+def source_metadata(names):
+    stats = {name: os.stat(os.path.join(ASSETSPATH, name)) for name in names}
+    return {'version': VERSION, 'pillow': Image is not None, 'heights': DISPLAY_HEIGHTS,
+        'files': {name: [stat.st_mtime, stat.st_size] for name, stat in stats.items()}}
+
+
+def is_current(path, names):
+    try:
+        with open(os.path.join(path, "manifest.json")) as f:
+            return json.load(f)['source'] == source_metadata(names)
+    except (OSError, ValueError, KeyError):
+        return False
+
+
+def optimize_image(name, data):
+    # resized to the displayed size and recompressed; the original is kept if that is not smaller
+    if Image is None or name not in DISPLAY_HEIGHTS:
+        return data
+
+    image = Image.open(io.BytesIO(data))
+    height = 2 * DISPLAY_HEIGHTS[name]
+    if image.height > height:
+        image = image.resize((round(image.width * height / image.height), height), getattr(Image, "Resampling", Image).LANCZOS)
+
+    output = io.BytesIO()
+    if image.format == 'JPEG' or name.endswith(('.jpg', '.jpeg')):
+        image.convert('RGB').save(output, 'JPEG', quality=85, optimize=True, progressive=True)
+    else:
+        image.save(output, 'PNG', optimize=True)
+
+    return min(output.getvalue(), data, key=len)
+
+
+def fingerprinted(name, data):
+    base, ext = os.path.splitext(name)
+    return "{}.{}{}".format(base, hashlib.sha256(data).hexdigest()[:12], ext)
+
+
+def build(path=BUILDPATH):
+    # content-hashed copies of the referenced assets with their precompressed variants; built under a
+    # lock and swapped into place, as the data partitions are
+    names = sources()
+    if is_current(path, names):
+        return
+
+    if Image is None:
+        print("warning: Pillow is not installed, the images in assets/ are served at full size", file=sys.stderr)
+
+    with build_lock(path):
+        if not is_current(path, names):
+            swap_in(write_assets(names, new_build(path)), path)
+
+    manifest.cache_clear()
+
+
+def write_assets(names, tmp):
+    files = dict()
+    for name in names:
+        with open(os.path.join(ASSETSPATH, name), "rb") as f:
+            data = optimize_image(name, f.read())
+
+        files[name] = fingerprinted(name, data)
+        with open(os.path.join(tmp, files[name]), "wb") as f:
+            f.write(data)
+
+        if name.endswith(COMPRESSIBLE):
+            for ext, compressed in [('.br', brotli.compress(data, quality=11)), ('.gz', gzip.compress(data, 9, mtime=0))]:
+                if len(compressed) < len(data):
+                    with open(os.path.join(tmp, files[name] + ext), "wb") as f:
+                        f.write(compressed)
+
+    with open(os.path.join(tmp, "manifest.json"), "w") as f:
+        json.dump({'source': source_metadata(names), 'files': files}, f)
+
+    return tmp
+
+
+@functools.lru_cache(maxsize=None)
+def manifest(path=BUILDPATH):
+    try:
+        with open(os.path.join(path, "manifest.json")) as f:
+            return json.load(f)['files']
+    except (OSError, ValueError, KeyError):
+        return dict()
+
+
+def asset_url(name):
+    # fingerprinted url of a built asset, dash's own assets url when it has not been built
+    built = manifest().get(name)
+    return URL_PREFIX + "/" + built if built else "/assets/" + name
+
+
+def stylesheets():
+    # built stylesheets, included in place of the ones dash serves from assets/
+    return [asset_url(name) for name in manifest() if name.endswith('.css')]
+
+
+def ignored_assets():
+    # built stylesheets are included in place of dash's own, and scripts only by the app when it uses them
+    names = [name for name in manifest() if name.endswith('.css')]
+    names += [name for name in sorted(os.listdir(ASSETSPATH)) if name.endswith('.js')]
+    return "|".join("^" + re.escape(name) + "$" for name in names)
+
+
+def accepted_encodings():
+    return {e.split(';')[0].strip() for e in request.headers.get('Accept-Encoding', '').split(',')}
+
+
+@assets.route("/<filename>")
+def serve(filename):
+    if filename not in manifest().values():
+        abort(404)
+
+    path = os.path.join(BUILDPATH, filename)
+    headers = {'Cache-Control': "public, max-age=31536000, immutable", 'Vary': "Accept-Encoding"}
+
+    # the smallest precompressed variant the client accepts
+    encodings = accepted_encodings()
+    for ext, encoding in [('.br', 'br'), ('.gz', 'gzip')]:
+        if encoding in encodings and os.path.exists(path + ext):
+            path, headers['Content-Encoding'] = path + ext, encoding
+            break
+
+    with open(path, "rb") as f:
+        data = f.read()
+
+    return Response(data, mimetype=mimetypes.guess_type(filename)[0] or "application/octet-stream", headers=headers)
@@ -0,0 +1,309 @@
+import os
+import json
+import sqlite3
+import threading
+import functools
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+from utils.data import DATAPATH, PARTITIONPATH, get_store, get_stats, filter_data
+from utils.store import PartitionStore, build_lock, overlaps
+
+# engine running the filter -> groupby -> count queries of the pages: pandas, sqlite, duckdb or sharded
+QUERY_BACKEND = os.environ.get("QUERY_BACKEND", "pandas")
+
+# processes of the sharded backend, each holding about the same rows; a shard is a run of whole
+# partitions, so there are at most as many shards as partitions. Every process of a multi-process server
+# starts its own, which hold one copy of the data between them, so by default the cores are divided
+# between gunicorn's WEB_CONCURRENCY workers; each worker still costs about the size of the data
+SHARDS = int(os.environ.get("SHARDS", max((os.cpu_count() or 1) // int(os.environ.get("WEB_CONCURRENCY", 1)), 1)))
+
+SQLITEPATH = os.path.join(DATAPATH, "shelter.sqlite")
+
+# indexes of the sqlite table, the date range is part of nearly every query
+SQLITE_INDEXES = [
+    ["Date"],
+    ["outcome_type", "Date"],
+    ["sex_upon_outcome", "Date"],
+    ["breed", "Date"],
+    ["color", "Date"]
+]
+
+
+def quote(column):
+    return '"' + column.replace('"', '""') + '"'
+
+
+def timestamp(value):
+    return pd.Timestamp(value).strftime('%Y-%m-%d %H:%M:%S')
+
+
+class PandasBackend:
+    # filters and groups the partitions of the store in memory
+
+    def __init__(self, store):
+        self.store = store
+
+    def rows(self, columns, start_date=None, end_date=None, **filters):
+        final = filter_data(self.store.load(start_date, end_date), start_date, end_date, **filters)
+        return final[columns]
+
+    def count(self, by, start_date=None, end_date=None, **filters):
+        final = filter_data(self.store.load(start_date, end_date), start_date, end_date, **filters)
+        return pd.DataFrame(final.groupby(by, as_index=False)['count'].count())
+
+
+class SQLBackend:
+    # the same queries in SQL; None or an empty list means the filter is not applied, and rows with a
+    # missing grouping value are left out of a count as pandas' groupby does
+
+    # ordering that returns rows in the order of the partitions, when the engine does not keep it
+    row_order = None
+
+    def where(self, start_date=None, end_date=None, age_range=None, sexes=None, breeds=None, colours=None, cfa=None, outcomes=None):
+        clauses, params = list(), list()
+
+        if age_range is not None:
+            clauses.append('"outcome_age_(months)" BETWEEN ? AND ?')
+            params += [float(age_range[0]), float(age_range[1])]
+
+        for column, values in [('sex_upon_outcome', sexes), ('breed', breeds), ('color', colours), ('outcome_type', outcomes)]:
+            if values:
+                clauses.append('{} IN ({})'.format(quote(column), ', '.join('?' * len(values))))
+                params += list(values)
+
+        if start_date is not None:
+            clauses.append('"Date" >= ?')
+            params.append(self.date_param(start_date))
+
+        if end_date is not None:
+            clauses.append('"Date" <= ?')
+            params.append(self.date_param(end_date))
+
+        if cfa is not None:
+            clauses.append('cfa_breed = ?')
+            params.append(bool(cfa))
+
+        return clauses, params
+
+    def date_param(self, value):
+        return timestamp(value)
+
+    def rows(self, columns, **filters):
+        clauses, params = self.where(**filters)
+        sql = 'SELECT {} FROM outcomes'.format(', '.join(quote(c) for c in columns))
+        if clauses:
+            sql += ' WHERE ' + ' AND '.join(clauses)
+        if self.row_order:
+            sql += ' ORDER BY ' + self.row_order
+
+        return self.fix_types(self.query(sql, params))
+
+    def count(self, by, **filters):
+        by = [by] if isinstance(by, str) else list(by)
+        clauses, params = self.where(**filters)
+        clauses += ['{} IS NOT NULL'.format(quote(c)) for c in by]
+
+        keys = ', '.join(quote(c) for c in by)
+        sql = 'SELECT {}, COUNT("count") AS "count" FROM outcomes WHERE {} GROUP BY {} ORDER BY {}'.format(
+            keys, ' AND '.join(clauses), keys, keys)
+
+        final = self.fix_types(self.query(sql, params))
+        final['count'] = final['count'].astype('int64')
+
+        return final
+
+    def fix_types(self, final):
+        if 'Date' in final and not pd.api.types.is_datetime64_any_dtype(final['Date']):
+            final['Date'] = pd.to_datetime(final['Date'])
+        if 'cfa_breed' in final:
+            final['cfa_breed'] = final['cfa_breed'].astype(bool)
+
+        return final
+
+
+class SQLiteBackend(SQLBackend):
+    # a local sqlite file built from the partitions, with an index per common filter
+
+    # a scan through an index returns the rows in index order
+    row_order = 'rowid'
+
+    def __init__(self, store, path=SQLITEPATH):
+        self.path = path
+        self.local = threading.local()
+
+        # one worker builds the file, the others wait for it and find it current
+        if not self.is_current(store):
+            with build_lock(path):
+                if not self.is_current(store):
+                    self.build(store)
+
+    def connection(self):
+        # sqlite connections can not be shared between threads
+        if getattr(self.local, 'connection', None) is None:
+            self.local.connection = sqlite3.connect(self.path)
+        return self.local.connection
+
+    def is_current(self, store):
+        try:
+            with sqlite3.connect(self.path) as connection:
+                stored = connection.execute("SELECT value FROM metadata WHERE key = 'source'").fetchone()
+            return stored is not None and json.loads(stored[0]) == store.metadata.get('source')
+        except sqlite3.Error:
+            return False
+
+    def build(self, store):
+        # built next to the final file and moved into place
+        tmp = "{}.tmp-{}".format(self.path, os.getpid())
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+        with sqlite3.connect(tmp) as connection:
+            for frame in store.scan():
+                frame = frame.assign(Date=frame['Date'].dt.strftime('%Y-%m-%d %H:%M:%S'))
+                frame.to_sql('outcomes', connection, if_exists='append', index=False)
+
+            for i, columns in enumerate(SQLITE_INDEXES):
+                connection.execute('CREATE INDEX index_{} ON outcomes ({})'.format(i, ', '.join(quote(c) for c in columns)))
+
+            connection.execute("CREATE TABLE metadata (key TEXT PRIMARY KEY, value TEXT)")
+            connection.execute("INSERT INTO metadata VALUES ('source', ?)", [json.dumps(store.metadata.get('source'))])
+            connection.execute("ANALYZE")
+
+        os.replace(tmp, self.path)
+
+    def query(self, sql, params):
+        return pd.read_sql_query(sql, self.connection(), params=params)
+
+
+class DuckDBBackend(SQLBackend):
+    # vectorized, multi-threaded scans of the parquet partitions, pruning row groups on their statistics
+
+    def __init__(self, path=PARTITIONPATH):
+        try:
+            import duckdb
+        except ImportError:
+            raise ImportError("QUERY_BACKEND=duckdb requires the duckdb package (pip install duckdb)")
+
+        self.connection = duckdb.connect()
+        self.connection.execute("CREATE VIEW outcomes AS SELECT * FROM read_parquet('{}')".format(
+            os.path.join(path, "*.parquet").replace("'", "''")))
+        self.local = threading.local()
+
+    def date_param(self, value):
+        return pd.Timestamp(value).to_pydatetime()
+
+    def query(self, sql, params):
+        # one cursor per thread
+        if getattr(self.local, 'cursor', None) is None:
+            self.local.cursor = self.connection.cursor()
+        return self.local.cursor.execute(sql, params).df()
+
+
+# the backend of a sharded backend's worker process, over its own partitions
+shard = dict()
+
+
+def shard_groups(partitions, shards):
+    # runs of consecutive partitions, a new one starting with the partition whose middle row is past the
+    # next multiple of total / shards
+    total = sum(part['rows'] for part in partitions)
+    groups, rows = [[]], 0
+    for part in partitions:
+        if groups[-1] and len(groups) < shards and rows + part['rows'] / 2 >= total * len(groups) / shards:
+            groups.append([])
+        groups[-1].append(part)
+        rows += part['rows']
+    return groups
+
+
+def start_shard(path, names):
+    # runs once in each worker process, which keeps its partitions in memory from then on
+    store = PartitionStore(path, cache_size=len(names))
+    store.metadata = dict(store.metadata, partitions=[part for part in store.metadata['partitions'] if part['name'] in names])
+    for part in store.partitions():
+        store.partition(part)
+
+    shard['backend'] = PandasBackend(store)
+
+
+def shard_count(by, filters):
+    return shard['backend'].count(by, **filters)
+
+
+def shard_rows(columns, filters):
+    return shard['backend'].rows(columns, **filters)
+
+
+class ShardedBackend:
+    # the pandas queries scattered over long-lived worker processes, each filtering and counting the
+    # partitions of its shard in parallel with the others; the partial counts are summed here, and rows
+    # are concatenated in partition order
+
+    def __init__(self, store, path=PARTITIONPATH, shards=SHARDS):
+        # forked after the filter statistics are gathered, so that the workers plan as this process does
+        get_stats()
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context("fork" if "fork" in methods else None)
+
+        self.shards = list()
+        for group in shard_groups(store.metadata['partitions'], max(shards, 1)):
+            executor = ProcessPoolExecutor(1, mp_context=context, initializer=start_shard,
+                initargs=(path, [part['name'] for part in group]))
+            # start loading the shard right away rather than on the first query
+            executor.submit(int)
+            self.shards.append((group, executor))
+
+        # the workers only answer the process that started them; a process forked from it, a background
+        # callback or a precompute worker, queries the store itself
+        self.pid = os.getpid()
+        self.local = PandasBackend(store)
+
+    def forked(self):
+        return os.getpid() != self.pid
+
+    def scatter(self, func, start_date, end_date, *args):
+        # only the shards with partitions in the date range; the first one answers with no rows when none has
+        executors = [executor for group, executor in self.shards if any(overlaps(part, start_date, end_date) for part in group)]
+        futures = [executor.submit(func, *args) for executor in executors or [self.shards[0][1]]]
+        return [future.result() for future in futures]
+
+    def rows(self, columns, start_date=None, end_date=None, **filters):
+        if self.forked():
+            return self.local.rows(columns, start_date, end_date, **filters)
+
+        filters = dict(filters, start_date=start_date, end_date=end_date)
+        return pd.concat(self.scatter(shard_rows, start_date, end_date, columns, filters), ignore_index=True)
+
+    def count(self, by, start_date=None, end_date=None, **filters):
+        if self.forked():
+            return self.local.count(by, start_date, end_date, **filters)
+
+        filters = dict(filters, start_date=start_date, end_date=end_date)
+        parts = self.scatter(shard_count, start_date, end_date, by, filters)
+        if len(parts) == 1:
+            return parts[0]
+
+        final = pd.concat(parts, ignore_index=True)
+        return pd.DataFrame(final.groupby(by, as_index=False)['count'].sum())
+
+    def close(self):
+        if self.forked():
+            return
+        for _, executor in self.shards:
+            executor.shutdown()
+
+
+@functools.lru_cache(maxsize=None)
+def get_backend(name=None):
+    name = name or QUERY_BACKEND
+    if name == 'pandas':
+        return PandasBackend(get_store())
+    if name == 'sqlite':
+        return SQLiteBackend(get_store())
+    if name == 'duckdb':
+        get_store()
+        return DuckDBBackend()
+    if name == 'sharded':
+        return ShardedBackend(get_store())
+    raise ValueError("QUERY_BACKEND must be one of pandas, sqlite, duckdb, sharded")
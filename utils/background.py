@@ -0,0 +1,77 @@
+import os
+import numpy as np
+import pandas as pd
+import diskcache
+from dash import DiskcacheManager, dcc, html, clientside_callback, Input, Output
+import dash_bootstrap_components as dbc
+from utils.cache import CACHEPATH
+
+# callbacks whose estimated number of rows is above this threshold are run on the background queue
+ROW_THRESHOLD = int(os.environ.get("BACKGROUND_ROW_THRESHOLD", 250000))
+
+# local disk-backed queue for background callbacks, no external broker needed
+background_callback_manager = DiskcacheManager(diskcache.Cache(os.path.join(CACHEPATH, "background")))
+
+
+class RowEstimator:
+    # cumulative row counts per day and per age, so that range counts are two binary searches each
+
+    def __init__(self, store):
+        days, ages = pd.Series(dtype='int64'), pd.Series(dtype='int64')
+        for frame in store.scan(columns=["Date", "outcome_age_(months)"]):
+            days = days.add(frame["Date"].value_counts(), fill_value=0)
+            ages = ages.add(frame["outcome_age_(months)"].value_counts(), fill_value=0)
+
+        days, ages = days.sort_index(), ages.sort_index()
+        self.days, self.day_counts = days.index.values, np.concatenate([[0], days.cumsum().values])
+        self.ages, self.age_counts = ages.index.values, np.concatenate([[0], ages.cumsum().values])
+        self.rows = self.day_counts[-1]
+
+    def estimate(self, start_date, end_date, slider_value):
+        if self.rows == 0:
+            return 0
+
+        start = pd.Timestamp(start_date).to_datetime64()
+        end = pd.Timestamp(end_date).to_datetime64()
+        in_dates = self.day_counts[np.searchsorted(self.days, end, side="right")] - self.day_counts[np.searchsorted(self.days, start, side="left")]
+        in_ages = self.age_counts[np.searchsorted(self.ages, slider_value[1], side="right")] - self.age_counts[np.searchsorted(self.ages, slider_value[0], side="left")]
+
+        # assume date and age are independent
+        return int(in_dates * in_ages / self.rows)
+
+    def runs_in_background(self, start_date, end_date, slider_value):
+        return self.estimate(start_date, end_date, slider_value) > ROW_THRESHOLD
+
+
+def background_graph(graph_id, **graph_kwargs):
+    # a graph whose figure is written either by an inline callback (to "<id>-inline") or by a
+    # background callback (to "<id>-background"); whichever fired last is relayed to the graph
+    clientside_callback(
+        """
+        function(inline_figure, background_figure) {
+            const triggered = dash_clientside.callback_context.triggered.map(t => t.prop_id);
+            const figure = triggered.some(t => t.endsWith("-background.data")) ? background_figure : inline_figure;
+            return figure ? figure : dash_clientside.no_update;
+        }
+        """,
+        Output(graph_id, "figure"),
+        [Input(graph_id + "-inline", "data"),
+        Input(graph_id + "-background", "data")]
+    )
+
+    return html.Div([
+        dbc.Progress(id=graph_id + "-progress", value=0, color="secondary", striped=True, animated=True,
+            style={'visibility': 'hidden'}),
+        dcc.Graph(id=graph_id, **graph_kwargs),
+        dcc.Store(id=graph_id + "-inline"),
+        dcc.Store(id=graph_id + "-job"),
+        dcc.Store(id=graph_id + "-background")
+    ])
+
+
+def progress_outputs(graph_id):
+    return [Output(graph_id + "-progress", "value"), Output(graph_id + "-progress", "label")]
+
+
+def running_outputs(graph_id):
+    return [(Output(graph_id + "-progress", "style"), {'visibility': 'visible'}, {'visibility': 'hidden'})]
@@ -0,0 +1,88 @@
+import os
+import re
+import json
+import hashlib
+import functools
+import diskcache
+import pandas as pd
+from cachelib import FileSystemCache
+from utils.data import get_store
+
+CACHEPATH = os.environ.get("CACHE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "../cache"))
+
+# entries kept before the oldest are removed, and seconds an entry is kept
+FIGURE_CACHE_SIZE = int(os.environ.get("FIGURE_CACHE_SIZE", 2000))
+FIGURE_CACHE_TIMEOUT = int(os.environ.get("FIGURE_CACHE_TIMEOUT", 24 * 3600))
+
+# figures and aggregates on disk, so that all gunicorn workers and background jobs share them
+figure_cache = FileSystemCache(os.path.join(CACHEPATH, "figures"), threshold=FIGURE_CACHE_SIZE, default_timeout=FIGURE_CACHE_TIMEOUT)
+
+# counters of all workers and background jobs, next to the figures they count, reported by the prefetcher
+stats = diskcache.Cache(os.path.join(CACHEPATH, "stats"))
+
+DATE_PATTERN = re.compile(r'^\d{4}-\d{2}-\d{2}([ T]00:00:00)?$')
+
+
+def normalize(value):
+    # the date pickers send "2014-10-01" once a date is picked but "2014-10-01T00:00:00" for the
+    # layout default, and dropdowns send None or [] when cleared; both pairs must share a key
+    if isinstance(value, pd.Timestamp):
+        value = value.isoformat()
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, str) and DATE_PATTERN.match(value):
+        return value[:10]
+    if isinstance(value, (list, tuple)):
+        return [normalize(v) for v in value] or None
+    return value
+
+
+@functools.lru_cache(maxsize=None)
+def data_version():
+    # the csv the partitions were built from (path, size and modification time) and how they are split,
+    # so that figures of a previous csv or of another DATA_PATH are never read back
+    metadata = get_store().metadata
+    payload = json.dumps([metadata['source'], metadata.get('by')], sort_keys=True)
+    return hashlib.sha1(payload.encode()).hexdigest()[:12]
+
+
+def make_key(name, args):
+    payload = json.dumps([normalize(arg) for arg in args], default=str)
+    return name + ":" + data_version() + ":" + hashlib.sha1(payload.encode()).hexdigest()
+
+
+def count(name, delta=1):
+    stats.incr(name, delta)
+
+
+def cached_figure(func):
+    # memoize a figure (or any picklable result) by its filter arguments
+    name = func.__module__ + "." + func.__qualname__
+
+    @functools.wraps(func)
+    def wrapper(*args):
+        count('live_calls')
+        key = make_key(name, args)
+        entry = figure_cache.get(key)
+
+        if entry is not None:
+            count('live_hits')
+            if entry['prefetched']:
+                count('prefetch_hits')
+                figure_cache.set(key, {'value': entry['value'], 'prefetched': False})
+            return entry['value']
+
+        value = func(*args)
+        figure_cache.set(key, {'value': value, 'prefetched': False})
+        return value
+
+    def is_cached(*args):
+        return figure_cache.has(make_key(name, args))
+
+    def store(args, value, prefetched=False, timeout=None):
+        figure_cache.set(make_key(name, args), {'value': value, 'prefetched': prefetched}, timeout=timeout)
+
+    wrapper.is_cached = is_cached
+    wrapper.store = store
+    wrapper.uncached = func
+    return wrapper
@@ -0,0 +1,116 @@
+import json
+import pandas as pd
+from dash import dcc, clientside_callback, callback_context, Input, Output, State
+from dash.exceptions import PreventUpdate
+from utils.data import PERIODS, period_values
+
+
+class CrossFilter:
+    # a selection made by clicking a chart of a page, which the page's other charts are filtered to; the
+    # click is turned into {column: value} in the browser, from the columns px puts in the axis and legend
+    # titles, or from the path of a sunburst wedge
+
+    def __init__(self, store_id, sources, resets=()):
+        # sources maps the id of each clickable graph to the path columns of a sunburst, or None; a change
+        # of any of the resets, the page's filter inputs, clears the selection, which the charts drawn for
+        # the new filters may not have
+        self.store_id = store_id
+        self.sources = sources
+
+        clientside_callback(
+            """
+            function() {
+                const paths = %s;
+                const ids = Object.keys(paths);
+                const resets = %d;
+                const figures = Array.from(arguments).slice(ids.length + resets, 2 * ids.length + resets);
+                const current = arguments[2 * ids.length + resets];
+
+                const triggered = dash_clientside.callback_context.triggered.map(t => t.prop_id.split(".")[0]);
+                const index = ids.indexOf(triggered[0]);
+                if (index < 0) {
+                    return current ? null : dash_clientside.no_update;
+                }
+
+                const click = arguments[index];
+                if (!click || !click.points || !click.points.length) {
+                    return dash_clientside.no_update;
+                }
+
+                const point = click.points[0];
+                const values = {};
+                if (paths[ids[index]]) {
+                    String(point.id).split("/").forEach((value, i) => { values[paths[ids[index]][i]] = value; });
+                } else {
+                    const figure = figures[index] || {};
+                    const layout = figure.layout || {};
+                    const title = element => element && element.title && element.title.text;
+                    const trace = (figure.data || [])[point.curveNumber] || {};
+                    if (title(layout.xaxis) && ["string", "number"].includes(typeof point.x)) {
+                        values[title(layout.xaxis)] = String(point.x);
+                    }
+                    if (title(layout.yaxis) && typeof point.y === "string") {
+                        values[title(layout.yaxis)] = point.y;
+                    }
+                    if (title(layout.legend) && trace.name) {
+                        values[title(layout.legend)] = trace.name;
+                    }
+                }
+
+                // clicking the selected point again clears the selection
+                const selection = {source: ids[index], values: values};
+                return JSON.stringify(selection) === JSON.stringify(current) ? null : selection;
+            }
+            """ % (json.dumps(sources), len(resets)),
+            Output(store_id, "data"),
+            [Input(graph_id, "clickData") for graph_id in sources] + list(resets),
+            [State(graph_id, "figure") for graph_id in sources] + [State(store_id, "data")],
+            prevent_initial_call=True
+        )
+
+    def component(self):
+        return dcc.Store(id=self.store_id)
+
+    def input(self):
+        return Input(self.store_id, "data")
+
+    def selection_for(self, graph_id, selection):
+        # a graph is not filtered by its own selection, and not redrawn when it is made
+        if not selection or selection.get('source') != graph_id:
+            return selection
+        if callback_context.triggered_id == self.store_id:
+            raise PreventUpdate
+        return None
+
+
+def selected(counts, selection, columns):
+    # the rows of an aggregate within a selection, on the given columns only; Month_Year and Year also
+    # through the aggregate's Date
+    if not selection:
+        return counts
+
+    mask = pd.Series(True, index=counts.index)
+    for column, value in selection['values'].items():
+        if column not in columns:
+            continue
+        if column in counts:
+            values = counts[column]
+        elif column in PERIODS and 'Date' in counts:
+            values = period_values(counts['Date'], column)
+        else:
+            continue
+
+        if column == 'Date':
+            mask &= values == pd.Timestamp(value)
+        else:
+            mask &= values.astype(str) == str(value)
+
+    return counts[mask]
+
+
+def selected_period(selection):
+    # the period column and value of a selection made on a chart over time
+    for column in PERIODS:
+        if selection and column in selection['values']:
+            return column, selection['values'][column]
+    return None, None
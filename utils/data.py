@@ -0,0 +1,83 @@
+import os
+import sys
+import functools
+import numpy as np
+import pandas as pd
+from utils.store import PartitionStore, build_partitions, is_current
+from utils.planner import FilterSpec, ColumnStats, plan
+
+# DATA_PATH points the dashboard at another copy of the data, e.g. a synthetic one for benchmarks
+DATAPATH = os.environ.get("DATA_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "../data"))
+CSVPATH = os.path.join(DATAPATH, "animal-shelter-data.csv")
+PARTITIONPATH = os.path.join(DATAPATH, "partitions")
+
+# partitions hold one year (Year) or one month (Month_Year) of outcomes
+PARTITION_BY = os.environ.get("PARTITION_BY", "Year")
+
+# periods the charts and the export API can group by
+PERIODS = ["Date", "Month_Year", "Year"]
+
+# month names as prepare writes them
+MONTH_NAMES = pd.date_range("2000-01-01", periods=12, freq="MS").month_name()
+
+# EXPLAIN_QUERIES=1 prints the plan of every filtered query, with estimated and actual rows per step
+EXPLAIN_QUERIES = os.environ.get("EXPLAIN_QUERIES", "0") == "1"
+
+
+@functools.lru_cache(maxsize=None)
+def get_store():
+    # the csv is split into partitions on first use, and again whenever it changes
+    if not is_current(PARTITIONPATH, CSVPATH):
+        build_partitions(CSVPATH, PARTITIONPATH, prepare, by=PARTITION_BY)
+
+    return PartitionStore(PARTITIONPATH)
+
+
+def load_range(start_date=None, end_date=None):
+    # only the partitions overlapping the date range are loaded
+    return get_store().load(start_date, end_date)
+
+
+def prepare(df):
+    # data transformation
+    df["outcome_age_(months)"] = round(df["outcome_age_(days)"]/30)
+    df["raw_date"] = df["datetime"].str.split(' ').str[0]
+    df["Date"] = pd.to_datetime(df.raw_date)
+    df['Month'] = df['Date'].dt.month_name()
+    df['Year'] = df['Date'].dt.strftime('%Y')
+    df['Month_Year'] = df['Month']+'-'+df['Year'].astype(str)
+
+    return df
+
+
+def period_values(dates, period):
+    # the period columns prepare derives from the date, for aggregates that only kept the date;
+    # labelled once per distinct date
+    if period == 'Date':
+        return dates
+
+    codes, days = pd.factorize(dates)
+    labels = days.year.astype(str)
+    if period == 'Month_Year':
+        labels = MONTH_NAMES[days.month - 1] + '-' + labels
+
+    return pd.Series(np.asarray(labels, dtype=object)[codes], index=dates.index, name=period)
+
+
+@functools.lru_cache(maxsize=None)
+def get_stats():
+    return ColumnStats(get_store())
+
+
+@functools.lru_cache(maxsize=256)
+def get_plan(spec):
+    return plan(spec, get_stats())
+
+
+def filter_data(df, start_date=None, end_date=None, age_range=None, sexes=None, breeds=None, colours=None, cfa=None, outcomes=None):
+    # the filters of the pages; None or an empty list means the filter is not applied
+    spec = FilterSpec(start_date, end_date, age_range, sexes, breeds, colours, cfa, outcomes)
+    if EXPLAIN_QUERIES:
+        print(get_plan(spec).explain(df), file=sys.stderr)
+
+    return get_plan(spec).execute(df)
@@ -0,0 +1,84 @@
+import os
+import decimal
+import dash
+import numpy as np
+import pandas as pd
+import plotly.io.json
+from dash._utils import to_json
+from plotly.basedatatypes import BaseFigure
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# FAST_JSON=1 encodes callback responses and layouts with orjson when it is installed, to the same bytes
+# as dash's own encoder, which is then plotly's orjson engine
+FAST_JSON = os.environ.get("FAST_JSON", "0") == "1"
+
+OPTIONS = 0 if orjson is None else orjson.OPT_NON_STR_KEYS
+NATIVE = 0 if orjson is None else orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+
+def default(value):
+    # one object orjson can not encode, converted as plotly's clean_to_json_compatible converts it; orjson
+    # calls this again for what the result holds. Figures are their own data and layout, without the deep
+    # copy to_plotly_json makes of every trace
+    if isinstance(value, BaseFigure):
+        result = {"data": value._data, "layout": value._layout}
+        frames = [frame._props for frame in value._frame_objs]
+        if frames:
+            result["frames"] = frames
+        return result
+
+    if isinstance(value, np.ndarray):
+        # numbers orjson writes the same from a list as from the array; float32 arrays are written with
+        # their own shortest digits, which only the array can give
+        if value.dtype.kind in "biu" or value.dtype == np.float64:
+            return value.tolist()
+        if value.dtype.kind == "M":
+            return np.datetime_as_string(value).tolist()
+        if value.dtype.kind in "UO":
+            return value.tolist()
+    elif value is np.ma.masked:
+        return float("nan")
+    elif isinstance(value, np.datetime64):
+        return str(value)
+    elif isinstance(value, np.generic):
+        return float(value) if isinstance(value, float) else value.tolist()
+    elif value is pd.NaT:
+        return None
+    elif isinstance(value, pd.Timestamp):
+        return value.to_pydatetime()
+    elif isinstance(value, decimal.Decimal):
+        return float(value)
+    elif hasattr(value, "to_plotly_json"):
+        return value.to_plotly_json()
+
+    # anything else, series included, is left to dash's encoder
+    raise TypeError
+
+
+def fast_to_json(value):
+    # the steps of plotly's orjson engine: the value as it is, then converted by default, and anything
+    # else falls back to dash's encoder
+    if hasattr(value, "to_plotly_json"):
+        value = value.to_plotly_json()
+
+    try:
+        return orjson.dumps(value, option=NATIVE).decode()
+    except TypeError:
+        pass
+
+    try:
+        return orjson.dumps(value, default=default, option=OPTIONS).decode()
+    except TypeError:
+        return to_json(value)
+
+
+def init_app():
+    # dash imports its encoder by name into the modules that answer callbacks and serve the layout; with
+    # plotly set to its json engine the fast path would not give the same bytes
+    if FAST_JSON and orjson is not None and plotly.io.json.config.default_engine in ("auto", "orjson"):
+        dash._callback.to_json = fast_to_json
+        dash.dash.to_json = fast_to_json
@@ -0,0 +1,201 @@
+import time
+import numpy as np
+import pandas as pd
+
+# columns filtered by value, with the FilterSpec field holding the accepted values
+VALUE_FILTERS = [
+    ('sexes', 'sex_upon_outcome'),
+    ('breeds', 'breed'),
+    ('colours', 'color'),
+    ('outcomes', 'outcome_type')
+]
+
+AGE_COLUMN = "outcome_age_(months)"
+
+
+def date_value(value):
+    return None if value is None else pd.Timestamp(value)
+
+
+def value_set(values):
+    # None, a single value and a list of values, with no values meaning no filter
+    if values is None:
+        return None
+    if isinstance(values, (str, bool, int, float)):
+        values = [values]
+    return frozenset(values) or None
+
+
+class FilterSpec:
+    # the filters of the pages, normalized so that equivalent filters compare and hash equal: no
+    # values and None both mean the filter is not applied, and the order of the values does not matter
+
+    fields = ('start_date', 'end_date', 'age_range', 'sexes', 'breeds', 'colours', 'cfa', 'outcomes')
+
+    def __init__(self, start_date=None, end_date=None, age_range=None, sexes=None, breeds=None, colours=None, cfa=None, outcomes=None):
+        self.start_date = date_value(start_date)
+        self.end_date = date_value(end_date)
+        self.age_range = None if age_range is None else (float(age_range[0]), float(age_range[1]))
+        self.sexes = value_set(sexes)
+        self.breeds = value_set(breeds)
+        self.colours = value_set(colours)
+        self.cfa = None if cfa is None else bool(cfa)
+        self.outcomes = value_set(outcomes)
+
+    def key(self):
+        return tuple(getattr(self, field) for field in self.fields)
+
+    def __eq__(self, other):
+        return isinstance(other, FilterSpec) and self.key() == other.key()
+
+    def __hash__(self):
+        return hash(self.key())
+
+    def __repr__(self):
+        return "FilterSpec({})".format(", ".join("{}={!r}".format(field, value) for field, value in self.kwargs().items()))
+
+    def kwargs(self):
+        # the filters that are applied, as keyword arguments of the query backends
+        kwargs = dict()
+        for field, value in zip(self.fields, self.key()):
+            if isinstance(value, frozenset):
+                value = sorted(value, key=str)
+            if value is not None:
+                kwargs[field] = value
+        return kwargs
+
+
+class ColumnStats:
+    # row counts per value of the filtered columns, and cumulative counts per day and per age so that
+    # range counts are two binary searches each; gathered once with a scan of the store
+
+    def __init__(self, store):
+        columns = [column for _, column in VALUE_FILTERS] + ['cfa_breed', 'Date', AGE_COLUMN]
+        counts = {column: pd.Series(dtype='int64') for column in columns}
+        for frame in store.scan(columns=columns):
+            for column in columns:
+                counts[column] = counts[column].add(frame[column].value_counts(), fill_value=0)
+
+        self.values = {column: counts[column].to_dict() for column in columns[:-2]}
+        self.rows = int(sum(counts['Date']))
+
+        days, ages = counts['Date'].sort_index(), counts[AGE_COLUMN].sort_index()
+        self.days, self.day_counts = days.index.values, np.concatenate([[0], days.cumsum().values])
+        self.ages, self.age_counts = ages.index.values, np.concatenate([[0], ages.cumsum().values])
+
+    def fraction(self, count):
+        return count / self.rows if self.rows else 1.0
+
+    def in_values(self, column, values):
+        counts = self.values[column]
+        return self.fraction(sum(counts.get(value, 0) for value in values))
+
+    def in_dates(self, start, end):
+        first = 0 if start is None else np.searchsorted(self.days, start.to_datetime64(), side="left")
+        last = len(self.days) if end is None else np.searchsorted(self.days, end.to_datetime64(), side="right")
+        return self.fraction(max(self.day_counts[last] - self.day_counts[first], 0))
+
+    def in_ages(self, low, high):
+        first = np.searchsorted(self.ages, low, side="left")
+        last = np.searchsorted(self.ages, high, side="right")
+        return self.fraction(max(self.age_counts[last] - self.age_counts[first], 0))
+
+
+class Step:
+    # one predicate of a plan: a column, the mask it keeps, and the fraction of rows it is expected to keep
+
+    def __init__(self, description, column, mask, selectivity):
+        self.description = description
+        self.column = column
+        self.mask = mask
+        self.selectivity = selectivity
+
+
+class Plan:
+    # the predicates of a FilterSpec, most selective first; each one only looks at the rows the previous
+    # ones kept, through an array of row positions, and the rows are copied once at the end
+
+    def __init__(self, spec, steps):
+        self.spec = spec
+        self.steps = steps
+
+    def positions(self, df, trace=None):
+        index = None
+        for step in self.steps:
+            started = time.perf_counter()
+            values = df[step.column].values
+            if index is None:
+                index = np.flatnonzero(step.mask(values))
+            else:
+                index = index[step.mask(values[index])]
+            if trace is not None:
+                trace.append((len(index), time.perf_counter() - started))
+        return index
+
+    def execute(self, df):
+        index = self.positions(df)
+        return df if index is None else df.take(index)
+
+    def explain(self, df):
+        # each step with its estimated and actual rows, for debugging the order the planner picked
+        trace = list()
+        self.positions(df, trace)
+
+        lines = ["{!r} on {} rows".format(self.spec, len(df))]
+        remaining = expected = len(df)
+        for number, (step, (rows, seconds)) in enumerate(zip(self.steps, trace), 1):
+            expected *= step.selectivity
+            lines.append("  {}. {:<45} selectivity {:6.4f}  est {:>9.0f}  rows {:>9} -> {:<9} {:8.3f} ms".format(
+                number, step.description, step.selectivity, expected, remaining, rows, 1000 * seconds))
+            remaining = rows
+        if not self.steps:
+            lines.append("  no filters")
+        return "\n".join(lines)
+
+
+def in_mask(values):
+    accepted = list(values)
+    return lambda column: pd.Series(column, copy=False).isin(accepted).values
+
+
+def describe_values(column, values):
+    shown = sorted(values, key=str)
+    return "{} IN ({}{})".format(column, ", ".join(str(v) for v in shown[:2]), ", ..." if len(shown) > 2 else "")
+
+
+def plan(spec, stats):
+    # assumes the filters are independent, ties keep the order of the fields
+    steps = list()
+
+    if spec.age_range is not None:
+        low, high = spec.age_range
+        steps.append(Step("{} BETWEEN {:g} AND {:g}".format(AGE_COLUMN, low, high), AGE_COLUMN,
+            lambda column: (column >= low) & (column <= high), stats.in_ages(low, high)))
+
+    for field, column in VALUE_FILTERS:
+        values = getattr(spec, field)
+        if values is not None:
+            steps.append(Step(describe_values(column, values), column, in_mask(values), stats.in_values(column, values)))
+
+    if spec.start_date is not None or spec.end_date is not None:
+        start, end = spec.start_date, spec.end_date
+        start_value = None if start is None else start.to_datetime64()
+        end_value = None if end is None else end.to_datetime64()
+
+        def in_dates(column):
+            if start_value is None:
+                return column <= end_value
+            if end_value is None:
+                return column >= start_value
+            return (column >= start_value) & (column <= end_value)
+
+        steps.append(Step("Date BETWEEN {} AND {}".format(
+            "-" if start is None else start.date(), "-" if end is None else end.date()), 'Date', in_dates, stats.in_dates(start, end)))
+
+    if spec.cfa is not None:
+        cfa = spec.cfa
+        steps.append(Step("cfa_breed = {}".format(cfa), 'cfa_breed', lambda column: column == cfa,
+            stats.in_values('cfa_breed', [cfa])))
+
+    steps.sort(key=lambda step: step.selectivity)
+    return Plan(spec, steps)
@@ -0,0 +1,151 @@
+import os
+import sys
+import json
+import time
+import argparse
+import itertools
+import collections
+import importlib.util
+import multiprocessing
+import dash
+from utils.background import background_callback_manager
+from utils.cache import FIGURE_CACHE_SIZE, make_key
+from utils.data import get_store
+from utils import prefetch
+
+# batch job computing the figures of every page for a grid of filter presets, in parallel, into the
+# figure cache the app reads from; python -m utils.precompute [--grid grid.json] [--processes N]
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PAGES = os.path.join(ROOT, "pages")
+
+# filter controls each dimension of a preset sets, on every page that has them
+DIMENSIONS = {
+    'dates': [("date-picker-range.start_date", "date-picker-range.end_date"),
+        ("date-picker-range-overview.start_date", "date-picker-range-overview.end_date")],
+    'age': ["range-slider.value", "range-slider-age.value"],
+    'outcome': ["dropdown-outcome-subtypes.value", "dropdown-outcome-dist.value", "dropdown-outcome-age.value"],
+    'breed': ["dropdown-breed.value"]
+}
+
+# breeds of the default grid, most common first
+TOP_BREEDS = 5
+
+# seconds the precomputed figures are kept, longer than the figures cached by the app so that those are
+# pruned first when the cache is over its size; the keys change with the data, so a rebuilt data set
+# never reads them
+PRECOMPUTE_TIMEOUT = int(os.environ.get("PRECOMPUTE_TIMEOUT", 7 * 24 * 3600))
+
+
+def load_pages():
+    # the page modules register their figure functions, as dash.Dash(use_pages=True) would import them
+    if prefetch.registry:
+        return
+
+    dash.Dash(__name__, background_callback_manager=background_callback_manager)
+    for file in sorted(os.listdir(PAGES)):
+        if file.endswith(".py") and not file.startswith("_"):
+            spec = importlib.util.spec_from_file_location("pages." + file[:-3], os.path.join(PAGES, file))
+            spec.loader.exec_module(importlib.util.module_from_spec(spec))
+
+
+def default_grid(top_breeds=TOP_BREEDS):
+    # each calendar year, kittens and adults, each outcome type, and all breeds or one of the top ones; both
+    # ends of an age range are included and ages are whole months, so adults start at 13
+    from utils.search import value_index
+
+    store = get_store()
+    years = sorted(store.values('Year'))
+    return {
+        'dates': [["{}-01-01".format(year), "{}-12-31".format(year)] for year in years],
+        'age': [[store.min_age, 12], [13, store.max_age]],
+        'outcome': store.values('outcome_type'),
+        'breed': [None] + [[breed] for breed in value_index('breed').search(None, top_breeds)]
+    }
+
+
+def filter_states(grid):
+    # one filter state per combination of the grid's dimensions, in the "id.property" form of the pages
+    names = list(grid)
+    for values in itertools.product(*(grid[name] for name in names)):
+        state = dict()
+        for name, value in zip(names, values):
+            for control in DIMENSIONS[name]:
+                if isinstance(control, tuple):
+                    state.update(zip(control, value))
+                else:
+                    state[control] = value
+        yield state
+
+
+def make_tasks(grid, force=False):
+    # distinct arguments per figure function, as functions ignore the dimensions their page does not have
+    tasks, seen, cached = list(), set(), 0
+    for state in filter_states(grid):
+        for index, entry in enumerate(prefetch.registry):
+            args = tuple(state.get(i, entry['defaults'][i]) for i in entry['inputs'])
+            key = make_key(entry['func'].__name__, args)
+            if key in seen:
+                continue
+            seen.add(key)
+
+            if not force and entry['func'].is_cached(*args):
+                cached += 1
+            else:
+                tasks.append((index, args))
+
+    return tasks, cached
+
+
+def compute(task):
+    load_pages()
+    index, args = task
+    func = prefetch.registry[index]['func']
+
+    started = time.perf_counter()
+    func.store(args, func.uncached(*args), timeout=PRECOMPUTE_TIMEOUT)
+    return func.__name__, time.perf_counter() - started
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="precompute the figures of a grid of filter presets")
+    parser.add_argument("--grid", help="json file with the values of some of the dimensions: " + ", ".join(DIMENSIONS))
+    parser.add_argument("--top-breeds", type=int, default=TOP_BREEDS)
+    parser.add_argument("--processes", type=int, default=os.cpu_count())
+    parser.add_argument("--force", action="store_true", help="recompute figures that are already cached")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    load_pages()
+
+    grid = default_grid(args.top_breeds)
+    if args.grid:
+        with open(args.grid) as f:
+            grid.update(json.load(f))
+
+    tasks, cached = make_tasks(grid, args.force)
+    if len(tasks) + cached > FIGURE_CACHE_SIZE:
+        # over its size the cache removes the expired figures, then those expiring soonest
+        print("warning: {} figures do not fit in FIGURE_CACHE_SIZE={}, some of them will be pruned and computed "
+            "again by the app; raise FIGURE_CACHE_SIZE to keep the whole grid".format(
+            len(tasks) + cached, FIGURE_CACHE_SIZE), file=sys.stderr)
+
+    # forked workers start with the pages already imported
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context("fork" if "fork" in methods else None)
+
+    times = collections.defaultdict(list)
+    computing = time.perf_counter()
+    with context.Pool(args.processes) as pool:
+        for name, seconds in pool.imap_unordered(compute, tasks, chunksize=4):
+            times[name].append(seconds)
+    computing = time.perf_counter() - computing
+
+    for name, values in sorted(times.items()):
+        print("%-25s %6d figures  %8.1f ms each" % (name, len(values), 1000 * sum(values) / len(values)))
+    print("%d computed, %d already cached, %d processes: %.1f figures/s, %.1fs in total" % (
+        len(tasks), cached, args.processes, len(tasks) / computing if computing else 0, time.perf_counter() - started))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+import os
+import time
+import threading
+import collections
+from flask import jsonify
+from utils.cache import stats, count
+
+# speculative prefetch of the figures of the other pages under the same persisted filter state
+ENABLED = os.environ.get("PREFETCH", "1") == "1"
+
+# the prefetcher only starts a task once no request has been in flight for this many seconds
+IDLE_DELAY = float(os.environ.get("PREFETCH_IDLE_DELAY", 0.5))
+
+# figure functions of every page, with the component properties that feed their arguments
+registry = list()
+
+# the latest filter state of each page, not prefetched yet; a newer one replaces it, so that dragging a
+# slider leaves a single state to prefetch rather than one per value it went through
+latest = collections.OrderedDict()
+latest_changed = threading.Condition()
+requests_lock = threading.Lock()
+
+state = {'in_flight': 0, 'last_request': 0.0, 'idle_since': time.time(), 'worker': None}
+
+# counters kept with the figure cache's, so that a figure prefetched by one worker and read by another
+# counts in both totals; idle_seconds is the wall-clock time the workers had no request in flight
+COUNTERS = ['scheduled', 'superseded', 'prefetched', 'failed', 'cpu_seconds', 'wall_seconds', 'idle_seconds',
+    'live_calls', 'live_hits', 'prefetch_hits']
+
+
+def register(page, func, inputs, defaults):
+    # inputs are "id.property" strings, one per positional argument of func (a cached_figure);
+    # defaults holds the layout value of each, used when the filter state does not include it
+    registry.append({'page': page, 'func': func, 'inputs': inputs, 'defaults': defaults})
+
+
+def schedule(page, filter_state):
+    # called at the end of a page's callback with the values of its shared filter controls
+    if not ENABLED:
+        return
+
+    with latest_changed:
+        if page in latest:
+            count('superseded')
+        latest[page] = filter_state
+        latest_changed.notify()
+    count('scheduled')
+
+    start_worker()
+
+
+def tasks(page, filter_state):
+    # the figure functions of the other pages, with their arguments under the filter state
+    for entry in registry:
+        if entry['page'] != page:
+            yield entry['func'], tuple(filter_state.get(i, entry['defaults'][i]) for i in entry['inputs'])
+
+
+def start_worker():
+    if state['worker'] is None or not state['worker'].is_alive():
+        state['worker'] = threading.Thread(target=work, name="prefetch", daemon=True)
+        state['worker'].start()
+
+
+def work():
+    # lowest scheduling priority for this thread (Linux applies niceness per thread)
+    try:
+        os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 19)
+    except (AttributeError, OSError):
+        pass
+
+    while True:
+        with latest_changed:
+            while not latest:
+                latest_changed.wait()
+            page, filter_state = latest.popitem(last=False)
+
+        for func, args in tasks(page, filter_state):
+            # wait for the worker to be idle
+            while state['in_flight'] > 0 or time.time() - state['last_request'] < IDLE_DELAY:
+                time.sleep(IDLE_DELAY / 5)
+
+            # the rest of a state the page has moved on from is left out
+            with latest_changed:
+                if page in latest:
+                    break
+
+            try:
+                if not func.is_cached(*args):
+                    cpu, wall = time.thread_time(), time.perf_counter()
+                    func.store(args, func.uncached(*args), prefetched=True)
+                    count('cpu_seconds', time.thread_time() - cpu)
+                    count('wall_seconds', time.perf_counter() - wall)
+                    count('prefetched')
+            except Exception:
+                count('failed')
+
+
+def request_started():
+    with requests_lock:
+        if state['in_flight'] == 0 and ENABLED:
+            count('idle_seconds', time.time() - state['idle_since'])
+        state['in_flight'] += 1
+
+
+def request_finished(exception=None):
+    with requests_lock:
+        state['in_flight'] -= 1
+        state['last_request'] = state['idle_since'] = time.time()
+
+
+def report():
+    # totals of all workers, but for the states queued in this one; cpu_share is the prefetch cpu time per
+    # second of idle time
+    totals = {name: stats.get(name, 0) for name in COUNTERS}
+    return {
+        **totals,
+        'queued': len(latest),
+        'hit_rate': round(totals['prefetch_hits'] / totals['prefetched'], 4) if totals['prefetched'] else None,
+        'cpu_share': round(totals['cpu_seconds'] / totals['idle_seconds'], 4) if totals['idle_seconds'] else None
+    }
+
+
+def init_app(server):
+    # request hooks for idle detection and an endpoint reporting the prefetch statistics of all workers;
+    # idle time starts once the pages are imported
+    state['idle_since'] = time.time()
+    server.before_request(request_started)
+    server.teardown_request(request_finished)
+    server.add_url_rule("/_prefetch-stats", "prefetch_stats", lambda: jsonify(report()))
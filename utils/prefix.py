@@ -0,0 +1,105 @@
+import os
+import threading
+import collections
+import numpy as np
+import pandas as pd
+
+# memory of the per-sex, per-breed and per-combination variants kept, in MB; a variant is as large as
+# the base sums, about 8 MB on the shelter data, and the most recently used one is always kept
+MAX_VARIANTS_MB = float(os.environ.get("PREFIX_INDEX_VARIANTS_MB", 64))
+
+# columns read from the store to build the sums
+COLUMNS = ['Date', 'outcome_age_(months)', 'outcome_type', 'sex_upon_outcome', 'breed']
+
+
+class PrefixIndex:
+    # 2D prefix sums over (day x age in months) for every outcome type, so that the number of rows of
+    # each outcome in any date and age range is four array lookups; variants restricted to a sex, a
+    # breed or a combination of both are built the first time those filters are used
+
+    def __init__(self, store):
+        self.store = store
+        self.outcomes = sorted(store.values('outcome_type'))
+        self.days = pd.date_range(store.min_date.normalize(), store.max_date, freq='D')
+        self.min_age = int(store.min_age)
+        self.ages = int(store.max_age) - self.min_age + 1
+
+        self.variants = collections.OrderedDict()
+        self.lock = threading.Lock()
+        self.base = self.build()
+
+    def build(self, predicate=None):
+        # counts are accumulated one partition at a time
+        shape = (len(self.outcomes), len(self.days), self.ages)
+        counts = np.zeros(np.prod(shape), dtype=np.int64)
+
+        for final in self.store.scan(columns=COLUMNS):
+            if predicate is not None:
+                final = final[predicate(final)]
+            final = final[final['outcome_type'].notna() & final['Date'].notna() & final['outcome_age_(months)'].notna()]
+
+            outcome = pd.Categorical(final['outcome_type'], categories=self.outcomes).codes.astype(np.int64)
+            day = ((final['Date'] - self.days[0]).dt.days).values.astype(np.int64)
+            age = final['outcome_age_(months)'].values.astype(np.int64) - self.min_age
+
+            counts += np.bincount(np.ravel_multi_index((outcome, day, age), shape), minlength=len(counts))
+
+        counts = counts.reshape(shape)
+
+        # leading row and column of zeros so that empty prefixes need no special case
+        prefix = np.zeros((shape[0], shape[1] + 1, shape[2] + 1), dtype=np.int32)
+        prefix[:, 1:, 1:] = counts.cumsum(axis=1).cumsum(axis=2)
+
+        return prefix
+
+    def variant(self, key, predicate):
+        with self.lock:
+            if key in self.variants:
+                self.variants.move_to_end(key)
+                return self.variants[key]
+
+        prefix = self.build(predicate)
+
+        with self.lock:
+            self.variants[key] = prefix
+            while len(self.variants) > 1 and self.variants_bytes() > MAX_VARIANTS_MB * 2 ** 20:
+                self.variants.popitem(last=False)
+
+        return prefix
+
+    def variants_bytes(self):
+        return sum(prefix.nbytes for prefix in self.variants.values())
+
+    def bounds(self, start_date, end_date, age_range):
+        # half-open index ranges matching Date >= start_date, Date <= end_date and the inclusive age range
+        d0 = self.days.searchsorted(pd.Timestamp(start_date), side='left')
+        d1 = self.days.searchsorted(pd.Timestamp(end_date), side='right')
+        a0 = min(max(int(np.ceil(age_range[0])) - self.min_age, 0), self.ages)
+        a1 = min(max(int(np.floor(age_range[1])) - self.min_age + 1, 0), self.ages)
+
+        return d0, max(d1, d0), a0, max(a1, a0)
+
+    def lookup(self, prefix, d0, d1, a0, a1):
+        return prefix[:, d1, a1] - prefix[:, d0, a1] - prefix[:, d1, a0] + prefix[:, d0, a0]
+
+    def counts(self, start_date, end_date, age_range, sexes=None, breeds=None):
+        # number of rows of every outcome type matching the filters
+        d0, d1, a0, a1 = self.bounds(start_date, end_date, age_range)
+
+        if sexes and breeds:
+            key = ('sex-breed', tuple(sorted(sexes)), tuple(sorted(breeds)))
+            prefixes = [self.variant(key, lambda final: final['sex_upon_outcome'].isin(sexes) & final['breed'].isin(breeds))]
+        elif sexes:
+            # sexes are disjoint, so the counts of each selected sex add up
+            prefixes = [self.variant(('sex', s), lambda final, s=s: final['sex_upon_outcome'] == s) for s in set(sexes)]
+        elif breeds and len(set(breeds)) > 4:
+            key = ('breeds', tuple(sorted(set(breeds))))
+            prefixes = [self.variant(key, lambda final: final['breed'].isin(breeds))]
+        elif breeds:
+            prefixes = [self.variant(('breed', b), lambda final, b=b: final['breed'] == b) for b in set(breeds)]
+        else:
+            prefixes = [self.base]
+
+        total = sum(self.lookup(prefix, d0, d1, a0, a1) for prefix in prefixes)
+
+        return dict(zip(self.outcomes, total.tolist()))
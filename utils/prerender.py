@@ -0,0 +1,54 @@
+from dash import callback_context, html
+from dash.development.base_component import Component
+from dash.exceptions import PreventUpdate
+from utils.cache import normalize
+from utils import prefetch
+
+# the layouts hold the figures for their own filter values, computed once when the pages are imported,
+# so that a first visit with those values does not fire a full query per callback; they go through the
+# figure cache, shared by the workers, whose keys include the data version, so that neither the figures
+# nor the aggregates they are built from come from an earlier csv. Dash also embeds every page's layout
+# in the index html of every url, to validate the callbacks, so there the figures are left out
+
+
+def render(func):
+    # a page's figure function called with the values of its layout, as registered for prefetching
+    entry = next(e for e in prefetch.registry if e['func'] is func)
+    return func(*(entry['defaults'][i] for i in entry['inputs']))
+
+
+def skip_prerendered(defaults):
+    # the initial call of a callback whose inputs all still hold the layout's values has nothing to
+    # add to the pre-rendered layout; later calls always run, also when back at those values
+    if callback_context.triggered_id is not None:
+        return
+
+    inputs = callback_context.inputs
+    if all(key in defaults and normalize(value) == normalize(defaults[key]) for key, value in inputs.items()):
+        raise PreventUpdate
+
+
+def clone(component):
+    # the component with only its id and required props, as dash clones the layout functions it validates
+    signature = getattr(type(component).__init__, "__signature__", None)
+    props = {p: getattr(component, p) for p in component._prop_names if hasattr(component, p) and
+        (p == "id" or not signature or signature.parameters[p].default == Component.REQUIRED)}
+    if props.get("children"):
+        props["children"] = []
+    return type(component)(**props)
+
+
+def validation_layout(layout):
+    # every component with an id once, which is all dash needs to check the callbacks' ids and props
+    components = dict()
+    for component in layout._traverse_ids():
+        components.setdefault((type(component).__name__, str(component.id)), component)
+    return html.Div([clone(component) for component in components.values()])
+
+
+def init_app(app):
+    # use_pages sets the validation layout on the first request, from the full layouts of all pages; it
+    # is replaced right after by the slim one
+    @app.server.before_first_request
+    def slim_validation_layout():
+        app.validation_layout = validation_layout(app.validation_layout)
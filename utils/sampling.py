@@ -0,0 +1,82 @@
+import os
+import numpy as np
+import pandas as pd
+
+# share of each stratum kept in the sample, and the least rows kept from any stratum
+SAMPLE_FRACTION = float(os.environ.get("APPROX_SAMPLE_FRACTION", 0.05))
+MIN_STRATUM_ROWS = int(os.environ.get("APPROX_MIN_STRATUM_ROWS", 30))
+
+# normal quantile of the reported confidence intervals (95%)
+CONFIDENCE_Z = 1.96
+
+
+class StratifiedSample:
+    # uniform sample within every (outcome_type, Year) stratum, precomputed once; each sampled row
+    # stands for population/sample rows of its stratum; partitions are sampled one at a time, so a
+    # stratum spread over several partitions is sampled (and estimated) as one stratum per partition
+
+    def __init__(self, store, fraction=SAMPLE_FRACTION, min_rows=MIN_STRATUM_ROWS, strata=('outcome_type', 'Year'), seed=0):
+        self.keys = ['partition'] + list(strata)
+        rng = np.random.default_rng(seed)
+
+        frames, sizes = list(), list()
+        for part, df in enumerate(store.scan()):
+            df = df.assign(partition=part)
+            shuffled = df.iloc[rng.permutation(len(df))]
+            grouped = shuffled.groupby(self.keys)
+            population = grouped[self.keys[0]].transform('size')
+            take = np.minimum(population, np.maximum(min_rows, np.ceil(population * fraction)))
+            keep = (grouped.cumcount() < take).values
+
+            frame = shuffled[keep].copy()
+            frame['weight'] = (population / take)[keep]
+            frames.append(frame)
+            sizes.append(pd.DataFrame({'N': df.groupby(self.keys).size(), 'n': frame.groupby(self.keys).size()}))
+
+        self.frame = pd.concat(frames, ignore_index=True)
+        self.strata = pd.concat(sizes)
+
+    def estimate_counts(self, filtered):
+        # estimated number of matching population rows per stratum, and the variance of each estimate
+        strata = self.strata.assign(m=filtered.groupby(self.keys).size()).fillna({'m': 0})
+        p = strata['m'] / strata['n']
+        counts = strata['N'] * p
+        variance = (strata['N'] ** 2 * (1 - strata['n'] / strata['N']) * p * (1 - p) / (strata['n'] - 1)).where(strata['n'] > 1, 0)
+
+        return counts, variance
+
+    def proportions(self, filtered, outcome_values, z=CONFIDENCE_Z):
+        # ratio estimate of the share of each outcome type among the filtered rows, with the half-width
+        # of its confidence interval: a Wilson score interval on the effective sample size of the ratio's
+        # variance (delta method, strata sampled independently), made symmetric around the estimate. The
+        # plain normal interval has no width when few sampled rows match, and covered the exact shares
+        # in only 84% of random filters where 95% were stated
+        counts, variance = self.estimate_counts(filtered)
+        total = counts.sum()
+        outcome = counts.index.get_level_values('outcome_type')
+
+        results = list()
+        for value in outcome_values:
+            a, var_a = counts[outcome == value].sum(), variance[outcome == value].sum()
+            b, var_b = total - a, variance.sum() - var_a
+
+            # no sampled row matches: nothing is known about the shares
+            if total == 0:
+                results.append((0, 1.0))
+                continue
+
+            p = a / total
+            ratio_variance = (b ** 2 * var_a + a ** 2 * var_b) / total ** 4
+            n = p * (1 - p) / ratio_variance if ratio_variance > 0 else len(filtered)
+            results.append((p, wilson_half_width(p, n, z)))
+
+        return results
+
+
+def wilson_half_width(p, n, z):
+    # the larger distance from p to the ends of its Wilson score interval for n rows
+    if n <= 0:
+        return 1.0
+    center = (p + z ** 2 / (2 * n)) / (1 + z ** 2 / n)
+    width = z / (1 + z ** 2 / n) * np.sqrt(p * (1 - p) / n + z ** 2 / (4 * n ** 2))
+    return max(center + width - p, p - (center - width))
@@ -0,0 +1,90 @@
+import os
+import bisect
+import functools
+import collections
+from dash import dcc, callback, callback_context, Input, Output, State
+from dash.exceptions import PreventUpdate
+from utils.data import get_store
+
+# options a searchable dropdown offers at a time
+MAX_OPTIONS = int(os.environ.get("DROPDOWN_OPTIONS", 20))
+
+# dropdown ids whose options callback is registered; pages share ids such as "dropdown-breed"
+registered = set()
+
+
+class ValueIndex:
+    # prefix and substring search over the distinct values of a column, matches ranked by record count
+
+    def __init__(self, counts):
+        self.values = sorted(counts, key=lambda v: (-counts[v], str(v)))
+        self.lowered = [str(v).lower() for v in self.values]
+
+        # (word, rank) for every word of every value, for prefix matches on any word
+        self.words = sorted((word, rank) for rank, value in enumerate(self.lowered) for word in value.split())
+
+        # trigrams to the ranks of the values containing them, for substring matches
+        self.trigrams = collections.defaultdict(set)
+        for rank, value in enumerate(self.lowered):
+            for i in range(len(value) - 2):
+                self.trigrams[value[i:i + 3]].add(rank)
+
+    def prefix(self, text):
+        ranks = set()
+        for i in range(bisect.bisect_left(self.words, (text,)), len(self.words)):
+            word, rank = self.words[i]
+            if not word.startswith(text):
+                break
+            ranks.add(rank)
+        return ranks
+
+    def substring(self, text):
+        if len(text) < 3:
+            return {rank for rank, value in enumerate(self.lowered) if text in value}
+
+        grams = [self.trigrams.get(text[i:i + 3], set()) for i in range(len(text) - 2)]
+        candidates = set.intersection(*sorted(grams, key=len))
+        return {rank for rank in candidates if text in self.lowered[rank]}
+
+    def search(self, text, limit=MAX_OPTIONS):
+        text = (text or "").strip().lower()
+        if not text:
+            return self.values[:limit]
+
+        # values with a word starting with the text come before those only containing it
+        prefix = self.prefix(text)
+        ranks = sorted(prefix) + sorted(self.substring(text) - prefix)
+
+        return [self.values[rank] for rank in ranks[:limit]]
+
+
+@functools.lru_cache(maxsize=None)
+def value_index(column):
+    counts = collections.Counter()
+    for frame in get_store().scan(columns=[column]):
+        counts.update(frame[column].dropna().value_counts().to_dict())
+
+    return ValueIndex(counts)
+
+
+def search_options(column, search_value, value):
+    # the selected values are always offered, also when persisted ones are not among the matches
+    selected = [v for v in (value if isinstance(value, list) else [value]) if v is not None]
+    return selected + [v for v in value_index(column).search(search_value) if v not in selected]
+
+
+def search_dropdown(component_id, column, **kwargs):
+    # a dropdown whose options are searched on the server, instead of every value sent in the layout
+    if component_id not in registered:
+        registered.add(component_id)
+
+        @callback(Output(component_id, "options"),
+                    [Input(component_id, "search_value")],
+                    [State(component_id, "value")])
+        def update_options(search_value, value):
+            # the layout already offers the most common values when nothing is selected
+            if callback_context.triggered_id is None and not search_value and not value:
+                raise PreventUpdate
+            return search_options(column, search_value, value)
+
+    return dcc.Dropdown(id=component_id, options=value_index(column).search(None), **kwargs)
@@ -0,0 +1,249 @@
+import os
+import json
+import time
+import fcntl
+import shutil
+import contextlib
+import threading
+import collections
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# columns whose distinct values are kept in the metadata for the dropdown menus, in order of appearance
+VALUE_COLUMNS = ['sex_upon_outcome', 'breed', 'color', 'outcome_type', 'Year']
+
+# number of partitions kept in memory
+PARTITION_CACHE_SIZE = int(os.environ.get("PARTITION_CACHE_SIZE", 4))
+
+# rows of the source csv read at a time while building the partitions
+BUILD_CHUNK_ROWS = 500000
+
+
+def overlaps(part, start_date, end_date):
+    return ((start_date is None or pd.Timestamp(part['max_date']) >= pd.Timestamp(start_date)) and
+        (end_date is None or pd.Timestamp(part['min_date']) <= pd.Timestamp(end_date)))
+
+
+def merge_values(values, new_values):
+    seen = set(values)
+    values.extend(v for v in new_values if v not in seen and not pd.isna(v))
+
+
+class Store:
+    # row data split into date-ordered partitions, with the metadata needed to build the layouts
+
+    @property
+    def min_date(self):
+        return pd.Timestamp(self.metadata['partitions'][0]['min_date'])
+
+    @property
+    def max_date(self):
+        return pd.Timestamp(self.metadata['partitions'][-1]['max_date'])
+
+    @property
+    def min_age(self):
+        return self.metadata['min_age']
+
+    @property
+    def max_age(self):
+        return self.metadata['max_age']
+
+    @property
+    def rows(self):
+        return sum(part['rows'] for part in self.metadata['partitions'])
+
+    def values(self, column):
+        return list(self.metadata['values'][column])
+
+    def partitions(self, start_date=None, end_date=None):
+        # partition pruning on the min/max dates of each partition
+        return [part for part in self.metadata['partitions'] if overlaps(part, start_date, end_date)]
+
+    def load(self, start_date=None, end_date=None):
+        # rows of every partition overlapping the date range; callers still filter by date
+        frames = [self.partition(part) for part in self.partitions(start_date, end_date)]
+        if not frames:
+            return self.partition(self.metadata['partitions'][0]).iloc[:0]
+        if len(frames) == 1:
+            return frames[0]
+        return pd.concat(frames, ignore_index=True)
+
+
+class FrameStore(Store):
+    # a frame already in memory, split by year, e.g. synthetic data in the benchmarks
+
+    def __init__(self, df, by='Year'):
+        self.frames = {name: frame for name, frame in df.groupby(by, sort=True)}
+        self.metadata = {
+            'partitions': [partition_metadata(name, frame) for name, frame in self.frames.items()],
+            'min_age': float(df['outcome_age_(months)'].min()),
+            'max_age': float(df['outcome_age_(months)'].max()),
+            'values': {column: [v for v in df[column].unique().tolist() if not pd.isna(v)] for column in VALUE_COLUMNS}
+        }
+        self.metadata['partitions'].sort(key=lambda part: part['min_date'])
+
+    def partition(self, part):
+        return self.frames[part['name']]
+
+    def scan(self, start_date=None, end_date=None, columns=None):
+        for part in self.partitions(start_date, end_date):
+            frame = self.frames[part['name']]
+            yield frame if columns is None else frame[columns]
+
+
+class PartitionStore(Store):
+    # per-year (or per-month) parquet files with min/max date metadata; recently used partitions are
+    # kept in memory with LRU eviction so that memory stays bounded as years of history are added
+
+    def __init__(self, path, cache_size=PARTITION_CACHE_SIZE):
+        self.path = path
+        with open(os.path.join(path, "metadata.json")) as f:
+            self.metadata = json.load(f)
+
+        self.cache_size = cache_size
+        self.cache = collections.OrderedDict()
+        self.lock = threading.Lock()
+
+    def partition(self, part):
+        name = part['name']
+        with self.lock:
+            if name in self.cache:
+                self.cache.move_to_end(name)
+                return self.cache[name]
+
+        frame = pq.read_table(os.path.join(self.path, part['file'])).to_pandas()
+
+        with self.lock:
+            self.cache[name] = frame
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+
+        return frame
+
+    def scan(self, start_date=None, end_date=None, columns=None):
+        # one partition at a time, reading only the given columns and bypassing the cache
+        for part in self.partitions(start_date, end_date):
+            with self.lock:
+                cached = self.cache.get(part['name'])
+            if cached is not None:
+                yield cached if columns is None else cached[columns]
+            else:
+                yield pq.read_table(os.path.join(self.path, part['file']), columns=columns).to_pandas()
+
+
+def partition_metadata(name, frame):
+    return {
+        'name': str(name),
+        'file': str(name) + ".parquet",
+        'rows': len(frame),
+        'min_date': frame['Date'].min().isoformat(),
+        'max_date': frame['Date'].max().isoformat()
+    }
+
+
+def source_metadata(csv_path):
+    stat = os.stat(csv_path)
+    return {'path': os.path.abspath(csv_path), 'mtime': stat.st_mtime, 'size': stat.st_size}
+
+
+def is_current(path, csv_path):
+    try:
+        with open(os.path.join(path, "metadata.json")) as f:
+            return json.load(f)['source'] == source_metadata(csv_path)
+    except (OSError, ValueError, KeyError):
+        return False
+
+
+@contextlib.contextmanager
+def build_lock(path):
+    # one process at a time builds path, e.g. gunicorn workers starting together; the others wait and
+    # find the build current once they hold the lock
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path + ".lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def new_build(path):
+    # an empty directory for the next build of path, next to it; builds a crashed process left are removed
+    current = os.path.realpath(path)
+    folder, base = os.path.split(path)
+    for name in os.listdir(folder or "."):
+        build = os.path.join(folder, name)
+        if name.startswith(base + ".build-") and os.path.realpath(build) != current:
+            shutil.rmtree(build, ignore_errors=True)
+
+    build = "{}.build-{}".format(path, time.time_ns())
+    os.makedirs(build)
+    return build
+
+
+def swap_in(build, path):
+    # path is a symlink to the current build, replaced with a single rename so that readers always find
+    # a complete build; a directory left there by an older version is removed first
+    previous = os.path.realpath(path) if os.path.islink(path) else None
+    if os.path.isdir(path) and not os.path.islink(path):
+        shutil.rmtree(path)
+
+    link = "{}.link-{}".format(path, os.getpid())
+    if os.path.lexists(link):
+        os.remove(link)
+    os.symlink(os.path.basename(build), link)
+    os.replace(link, path)
+
+    if previous is not None:
+        shutil.rmtree(previous, ignore_errors=True)
+
+
+def build_partitions(csv_path, path, prepare, by='Year'):
+    # split the csv into one parquet file per partition, reading it in chunks so that the whole
+    # history is never in memory; another process may have built it while this one waited
+    with build_lock(path):
+        if not is_current(path, csv_path):
+            swap_in(write_partitions(csv_path, new_build(path), prepare, by), path)
+
+
+def write_partitions(csv_path, tmp, prepare, by):
+    writers, parts, schema = dict(), dict(), None
+    metadata = {'source': source_metadata(csv_path), 'by': by, 'min_age': None, 'max_age': None,
+        'values': {column: list() for column in VALUE_COLUMNS}}
+
+    for chunk in pd.read_csv(csv_path, index_col=False, chunksize=BUILD_CHUNK_ROWS):
+        chunk = prepare(chunk)
+
+        if schema is None:
+            # text columns that are empty in the first chunk would otherwise be typed as null
+            schema = pa.Schema.from_pandas(chunk, preserve_index=False)
+            schema = pa.schema([pa.field(f.name, pa.string()) if pa.types.is_null(f.type) else f for f in schema])
+
+        for column in VALUE_COLUMNS:
+            merge_values(metadata['values'][column], chunk[column].unique().tolist())
+
+        ages = chunk['outcome_age_(months)']
+        metadata['min_age'] = float(min(ages.min(), metadata['min_age'] if metadata['min_age'] is not None else ages.min()))
+        metadata['max_age'] = float(max(ages.max(), metadata['max_age'] if metadata['max_age'] is not None else ages.max()))
+
+        for name, frame in chunk.groupby(by, sort=False):
+            part = partition_metadata(name, frame)
+            if name not in writers:
+                writers[name] = pq.ParquetWriter(os.path.join(tmp, part['file']), schema)
+                parts[name] = part
+            else:
+                parts[name]['rows'] += part['rows']
+                parts[name]['min_date'] = min(parts[name]['min_date'], part['min_date'])
+                parts[name]['max_date'] = max(parts[name]['max_date'], part['max_date'])
+
+            writers[name].write_table(pa.Table.from_pandas(frame, schema=schema, preserve_index=False))
+
+    for writer in writers.values():
+        writer.close()
+
+    metadata['partitions'] = sorted(parts.values(), key=lambda part: part['min_date'])
+    with open(os.path.join(tmp, "metadata.json"), "w") as f:
+        json.dump(metadata, f)
+
+    return tmp
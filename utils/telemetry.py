@@ -0,0 +1,94 @@
+import os
+import collections
+import numpy as np
+import diskcache
+from flask import request, jsonify
+from utils.assets import asset_url
+from utils.cache import CACHEPATH
+
+# TELEMETRY=1 includes a script timing, in the browser, each graph from the callback response carrying
+# its figure to the figure being drawn, with the size of the figure; the measurements are aggregated
+# per page and graph id on disk, so that every worker reports those of all of them
+ENABLED = os.environ.get("TELEMETRY", "0") == "1"
+
+SCRIPT = "render-telemetry.js"
+
+# render times kept per graph for the percentiles, and limits on what a client can send
+SAMPLES = 500
+MAX_BATCH = 100
+MAX_GRAPHS = 200
+
+# aggregates shared by the workers, updated in a transaction per batch
+graphs = diskcache.Cache(os.path.join(CACHEPATH, "telemetry"))
+
+
+def scripts():
+    return [asset_url(SCRIPT)] if ENABLED else []
+
+
+def add(measurements):
+    # one transaction per batch, so that the batches of other workers are not lost in between
+    with graphs.transact():
+        for page, graph, render_ms, size in measurements:
+            entry = graphs.get((page, graph))
+            if entry is None:
+                if len(graphs) >= MAX_GRAPHS:
+                    continue
+                entry = {'count': 0, 'bytes': 0, 'render_ms': collections.deque(maxlen=SAMPLES)}
+
+            entry['count'] += 1
+            entry['bytes'] += size
+            entry['render_ms'].append(render_ms)
+            graphs.set((page, graph), entry)
+
+
+def collect():
+    # a batch of measurements from the script; anything malformed is left out
+    payload = request.get_json(force=True, silent=True)
+    measurements = payload.get('measurements') if isinstance(payload, dict) else None
+    if not isinstance(measurements, list):
+        return "", 400
+
+    valid = list()
+    for m in measurements[:MAX_BATCH]:
+        try:
+            page, graph = str(m['page'])[:100], str(m['graph'])[:100]
+            render_ms, size = float(m['render_ms']), int(m['bytes'])
+        except (TypeError, KeyError, ValueError):
+            continue
+        if 0 <= render_ms < 600000 and size >= 0:
+            valid.append((page, graph, render_ms, size))
+
+    add(valid)
+
+    return "", 204
+
+
+def report():
+    # slowest graphs first: those whose figures are worth aggregating on the server
+    with graphs.transact():
+        entries = [(page, graph, graphs.get((page, graph))) for page, graph in graphs]
+
+    rows = list()
+    for page, graph, entry in entries:
+        times = np.array(entry['render_ms'])
+        rows.append({
+            'page': page,
+            'graph': graph,
+            'count': entry['count'],
+            'mean_kb': round(entry['bytes'] / entry['count'] / 1024, 1),
+            'mean_ms': round(float(times.mean()), 1),
+            'p50_ms': round(float(np.percentile(times, 50)), 1),
+            'p95_ms': round(float(np.percentile(times, 95)), 1)
+        })
+
+    return sorted(rows, key=lambda row: -row['p50_ms'])
+
+
+def init_app(server):
+    # an endpoint for the script's batches and one reporting the aggregates of all workers
+    if not ENABLED:
+        return
+
+    server.add_url_rule("/_telemetry", "telemetry", collect, methods=["POST"])
+    server.add_url_rule("/_telemetry-stats", "telemetry_stats", lambda: jsonify(report()))